@@ -5,10 +5,24 @@ import '../styles/PdfUploader.css';
 import QuestionForm from './QuestionForm';
 import TypingIndicator from './TypingIndicator';
 
+const JOB_POLL_INTERVAL_MS = 1000;
+
+const parseSseFrame = (frame) => {
+  let event = 'message';
+  let data = '';
+  for (const line of frame.split('\n')) {
+    if (line.startsWith('event:')) {
+      event = line.slice(6).trim();
+    } else if (line.startsWith('data:')) {
+      data += line.slice(5).trim();
+    }
+  }
+  return { event, data: data ? JSON.parse(data) : {} };
+};
+
 function PdfUploader() {
   const [uploadedFile, setUploadedFile] = useState(null);
   const [loading, setLoading] = useState(false);
-  const [answer, setAnswer] = useState('');
   const [isAnswering, setIsAnswering] = useState(false);
   const [pdfList, setPdfList] = useState([]);
   const [messages, setMessages] = useState([{
@@ -21,57 +35,90 @@ function PdfUploader() {
   
   const fileInputRef = useRef(null);
   const messagesEndRef = useRef(null);
+  // Server-side conversation, so follow-up questions reuse earlier retrieval
+  const sessionIdRef = useRef(null);
+
+  const waitForJob = async (jobId) => {
+    while (true) {
+      const { data: job } = await axios.get(`http://localhost:8000/jobs/${jobId}`);
+      if (job.status === 'completed') {
+        return job;
+      }
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Processing failed');
+      }
+      await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    }
+  };
+
+  // A new PDF starts a new conversation
+  const endSession = () => {
+    if (sessionIdRef.current) {
+      axios.delete(`http://localhost:8000/sessions/${sessionIdRef.current}`).catch(() => {});
+      sessionIdRef.current = null;
+    }
+  };
 
-  const processUploadedFile = async (file) => {
-    if (file && file.type === 'application/pdf') {
-      setLoading(true);
-      const formData = new FormData();
-      formData.append('file', file);
+  const processUploadedFiles = async (files) => {
+    const pdfFiles = files.filter(file => file && file.type === 'application/pdf');
+    if (pdfFiles.length === 0) {
+      alert('Please upload a valid PDF file.');
+      return;
+    }
+    
+    setLoading(true);
+    const formData = new FormData();
+    pdfFiles.forEach(file => formData.append('files', file));
+    
+    try {
+      const response = await axios.post('http://localhost:8000/upload-pdfs', formData, {
+        headers: { 'Content-Type': 'multipart/form-data' },
+      });
       
-      try {
-        const response = await axios.post('http://localhost:8000/upload-pdf', formData, {
-          headers: { 'Content-Type': 'multipart/form-data' },
-        });
-        
-        setUploadedFile(file.name);
-        setActivePdf(file.name);
+      // Ingestion runs in the background; wait for every job to finish
+      const results = await Promise.allSettled(response.data.jobs.map(job => (
+        job.job_id ? waitForJob(job.job_id) : Promise.reject(new Error(job.error))
+      )));
+      const uploaded = response.data.jobs
+        .filter((job, index) => results[index].status === 'fulfilled')
+        .map(job => job.file_name);
+      const failed = response.data.jobs
+        .filter((job, index) => results[index].status === 'rejected')
+        .map(job => job.file_name);
+      
+      if (uploaded.length > 0) {
+        const lastFile = uploaded[uploaded.length - 1];
+        endSession();
+        setUploadedFile(lastFile);
+        setActivePdf(lastFile);
         
-        // Add the file to the PDF list if not already present
-        if (!pdfList.includes(file.name)) {
-          setPdfList(prev => [...prev, file.name]);
-        }
-        setMessages([{ id: 1, text: `Uploaded ${file.name} successfully. Ask me anything!`, sender: 'bot' }]);
+        // Add the files to the PDF list if not already present
+        setPdfList(prev => [...prev, ...uploaded.filter(name => !prev.includes(name))]);
+        setMessages([{ id: 1, text: `Uploaded ${uploaded.join(', ')} successfully. Ask me anything!`, sender: 'bot' }]);
         
         // Hide the upload UI after successful upload
         setShowUploadUI(false);
-      } catch (error) {
-        console.error('Upload error:', error.response?.data || error.message);
-        alert('Failed to upload PDF.');
-      } finally {
-        setLoading(false);
       }
-    } else {
-      alert('Please upload a valid PDF file.');
+      if (failed.length > 0) {
+        alert(`Failed to process: ${failed.join(', ')}`);
+      }
+    } catch (error) {
+      console.error('Upload error:', error.response?.data || error.message);
+      alert('Failed to upload PDF.');
+    } finally {
+      setLoading(false);
     }
   };
 
   const onDrop = useCallback((acceptedFiles) => {
-    const file = acceptedFiles[0];
-    processUploadedFile(file);
-  }, [pdfList]);
+    processUploadedFiles(acceptedFiles);
+  }, []);
 
   const { getRootProps, getInputProps } = useDropzone({
     onDrop,
     accept: { 'application/pdf': ['.pdf'] }
   });
 
-  useEffect(() => {
-    if (answer) {
-      setMessages(prev => [...prev, { id: Date.now(), text: answer, sender: 'bot' }]);
-      setAnswer('');
-    }
-  }, [answer]);
-
   // Auto-scroll to bottom of messages
   useEffect(() => {
     if (messagesEndRef.current) {
@@ -79,36 +126,81 @@ function PdfUploader() {
     }
   }, [messages]);
 
+  const appendBotText = (id, text) => {
+    setMessages(prev => prev.some(m => m.id === id)
+      ? prev.map(m => (m.id === id ? { ...m, text: m.text + text } : m))
+      : [...prev, { id, text, sender: 'bot' }]);
+  };
+
+  const setBotSources = (id, sources) => {
+    setMessages(prev => prev.map(m => (m.id === id ? { ...m, sources } : m)));
+  };
+
   const handleNewMessage = async (message) => {
     // Add user message to chat
     const newMessageId = Date.now();
+    const botMessageId = newMessageId + 1;
     setMessages(prev => [...prev, { id: newMessageId, text: message, sender: 'user' }]);
     
-    // Show typing indicator
+    // Show typing indicator until the first token arrives
     setIsAnswering(true);
     
-    // Process the message
+    // Stream the answer as Server-Sent Events
     try {
-      const payload = { query: message.trim(), num_chunks: 5 };
-      const response = await axios.post('http://localhost:8000/ask-question', payload, {
+      if (!sessionIdRef.current) {
+        const { data: session } = await axios.post('http://localhost:8000/sessions');
+        sessionIdRef.current = session.session_id;
+      }
+      // Only search the PDF the user is chatting with
+      const payload = {
+        query: message.trim(),
+        num_chunks: 5,
+        file_names: activePdf ? [activePdf] : null,
+        session_id: sessionIdRef.current,
+      };
+      const response = await fetch('http://localhost:8000/ask-question/stream', {
+        method: 'POST',
         headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(payload),
       });
+      if (!response.ok) {
+        const errorBody = await response.json().catch(() => ({}));
+        throw new Error(errorBody.detail || response.statusText);
+      }
       
-      // Wait a bit before showing the response to let the typing indicator be visible
-      setTimeout(() => {
-        setAnswer(response.data.answer || response.data.message || 'No answer provided.');
-        setIsAnswering(false);
-      }, 1000);
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+          break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+        const frames = buffer.split('\n\n');
+        buffer = frames.pop();
+        for (const frame of frames) {
+          const { event, data } = parseSseFrame(frame);
+          if (event === 'token' || event === 'message') {
+            setIsAnswering(false);
+            appendBotText(botMessageId, data.text);
+          } else if (event === 'sources') {
+            setBotSources(botMessageId, data.sources);
+          } else if (event === 'error') {
+            throw new Error(data.detail);
+          }
+        }
+      }
     } catch (error) {
-      const errorDetail = error.response?.data?.detail || error.message;
-      setTimeout(() => {
-        setAnswer(`Failed to get an answer: ${typeof errorDetail === 'string' ? errorDetail : JSON.stringify(errorDetail, null, 2)}`);
-        setIsAnswering(false);
-      }, 1000);
+      const errorDetail = error.message;
+      appendBotText(botMessageId, `Failed to get an answer: ${errorDetail}`);
+    } finally {
+      setIsAnswering(false);
     }
   };
 
   const handleSelectPdf = (pdfName) => {
+    endSession();
     setActivePdf(pdfName);
     setUploadedFile(pdfName);
     setMessages([{ id: 1, text: `Loaded ${pdfName}. Ask me anything!`, sender: 'bot' }]);
@@ -127,9 +219,9 @@ function PdfUploader() {
   };
 
   const handleFileInput = (event) => {
-    const file = event.target.files[0];
-    if (file) {
-      processUploadedFile(file);
+    const files = Array.from(event.target.files);
+    if (files.length > 0) {
+      processUploadedFiles(files);
     }
   };
 
@@ -170,6 +262,7 @@ function PdfUploader() {
             id="sidebar-file-input"
             type="file"
             accept="application/pdf"
+            multiple
             onChange={handleFileInput}
             ref={fileInputRef}
             style={{ display: 'none' }}
@@ -220,7 +313,7 @@ function PdfUploader() {
                     <path d="M12 5v9M12 5l-4 4M12 5l4 4" stroke="currentColor" strokeWidth="2" strokeLinecap="round" strokeLinejoin="round"/>
                   </svg>
                 </div>
-                <p className="upload-text">Click to upload, or drag PDF here</p>
+                <p className="upload-text">Click to upload, or drag PDFs here</p>
                 
                 <div className="upload-button-container">
                   <button className="upload-button">
@@ -247,6 +340,11 @@ function PdfUploader() {
                 <div key={message.id} className={`message-wrapper ${message.sender === 'bot' ? 'bot-message' : 'user-message'}`}>
                   <div className="message">
                     <p>{message.text}</p>
+                    {message.sources && message.sources.length > 0 && (
+                      <div className="message-sources">
+                        Sources: {message.sources.map(source => `${source.file_name} (chunk ${source.chunk_id})`).join(', ')}
+                      </div>
+                    )}
                   </div>
                 </div>
               ))}
@@ -0,0 +1,135 @@
+from typing import Any, Dict
+
+from app.core.config.settings import get_settings
+from app.core.jobs import Job
+from app.core.registry import ServiceRegistry
+from app.core.uploads import SpooledUpload
+
+# Services are built on first use; each factory imports its own client library
+services = ServiceRegistry()
+
+
+def _providers():
+    from app.core.http_clients import ProviderClients
+    settings = get_settings()
+    return ProviderClients(
+        timeout=settings.HTTP_TIMEOUT_SECONDS,
+        ocr_timeout=settings.OCR_TIMEOUT_SECONDS,
+        connect_timeout=settings.HTTP_CONNECT_TIMEOUT_SECONDS,
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS
+    )
+
+
+def _ocr_service():
+    from app.services.ocr_service import OCRService
+    return OCRService(services.get("providers"))
+
+
+def _text_processor():
+    from app.services.text_processor import TextProcessor
+    return TextProcessor(services.get("providers"))
+
+
+def _db_service():
+    from app.services.database import DatabaseService
+    return DatabaseService(services.get("providers"))
+
+
+def _qa_service():
+    from app.services.qa_service import QAService
+    return QAService(services.get("providers"))
+
+
+def _answer_cache():
+    from app.services.answer_cache import AnswerCache
+    settings = get_settings()
+    return AnswerCache(
+        similarity_threshold=settings.ANSWER_CACHE_THRESHOLD,
+        ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+        max_entries=settings.ANSWER_CACHE_MAX_ENTRIES
+    )
+
+
+def _session_store():
+    from app.core.sessions import MemorySessionStore
+    settings = get_settings()
+    return MemorySessionStore(
+        max_sessions=settings.SESSION_MAX_SESSIONS,
+        ttl_seconds=settings.SESSION_TTL_SECONDS
+    )
+
+
+def _query_pool():
+    from app.core.admission import AdmissionPool
+    settings = get_settings()
+    return AdmissionPool("query", max_concurrency=settings.QUERY_MAX_CONCURRENCY, max_queue=settings.QUERY_MAX_QUEUE)
+
+
+def _page_manifest():
+    from app.core.page_manifest import PageManifest
+    return PageManifest(get_settings().PAGE_MANIFEST_PATH)
+
+
+def _ingestion_pipeline():
+    from app.services.ingestion import IngestionPipeline
+    settings = get_settings()
+    text_processor = services.get("text_processor")
+    db_service = services.get("db")
+
+    def delete_rows(file_name, chunk_ids):
+        db_service.delete_documents(file_name, chunk_ids)
+        text_processor.unindex_chunks(file_name, chunk_ids)
+
+    def documents_changed():
+        # Stored answers and the chunks cached in sessions may be stale
+        services.get("answer_cache").invalidate()
+        services.get("sessions").invalidate()
+
+    return IngestionPipeline(
+        services.get("ocr").process_pdf_pages,
+        text_processor.chunker,
+        db_service.store_documents,
+        buffer_size=settings.INGEST_BUFFER_PAGES,
+        on_documents_changed=documents_changed,
+        index_rows=text_processor.index_chunks,
+        manifest=services.get("page_manifest") if settings.INCREMENTAL_INGEST else None,
+        delete_rows=delete_rows,
+        yield_to_queries=lambda: services.get("query_pool").yield_to(settings.INGEST_YIELD_MAX_SECONDS),
+        stored_chunk_ids=db_service.chunk_ids
+    )
+
+
+services.register("providers", _providers)
+services.register("ocr", _ocr_service)
+services.register("text_processor", _text_processor)
+services.register("db", _db_service)
+services.register("qa", _qa_service)
+services.register("answer_cache", _answer_cache)
+services.register("sessions", _session_store)
+services.register("query_pool", _query_pool)
+services.register("page_manifest", _page_manifest)
+services.register("ingestion", _ingestion_pipeline)
+
+get_text_processor = services.provide("text_processor")
+get_db_service = services.provide("db")
+get_qa_service = services.provide("qa")
+get_answer_cache = services.provide("answer_cache")
+get_session_store = services.provide("sessions")
+
+
+async def close_services():
+    # Closes the shared connection pools if any provider was used
+    providers = services.peek("providers")
+    if providers is not None:
+        await providers.aclose()
+
+
+def run_ingestion(job: Job, upload: SpooledUpload) -> Dict[str, Any]:
+    # Resolved on the ingestion worker, so the first upload does not build
+    # the OCR, embedding and database clients on the event loop
+    try:
+        return services.get("ingestion").run(job, upload)
+    finally:
+        upload.discard()
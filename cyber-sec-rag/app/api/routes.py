@@ -1,17 +1,67 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from app.services.ocr_service import OCRService
-from app.services.text_processor import TextProcessor
-from app.services.database import DatabaseService
-from app.services.qa_service import QAService
-from typing import List, Dict, Any
+import asyncio
+import logging
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from app.api.dependencies import (
+    get_answer_cache,
+    get_db_service,
+    get_qa_service,
+    get_session_store,
+    get_text_processor,
+    run_ingestion,
+    services,
+)
+from app.services.answer_cache import answer_scope
+from app.core.admission import Overloaded
+from app.core.config.settings import get_settings
+from app.core.context_builder import build_context, drop_near_duplicates
+from app.core.jobs import JobManager
+from app.core.rank_fusion import reciprocal_rank_fusion
+from app.core.sessions import ConversationSession, retrieve_with_session, session_scope
+from app.core.single_flight import SingleFlight, normalize_query
+from app.core.sse import format_sse
+from app.core.tracing import span
+from app.core.uploads import UploadTooLarge, spool_upload
+from typing import List, Dict, Any, Optional
 
+logger = logging.getLogger(__name__)
+
+# Shared by both APIs: app/main.py mounts it under /api/v1, main.py at the root
 router = APIRouter()
+# Questions as query parameters, for the app API; main.py accepts the same
+# questions as JSON bodies, see QuestionRequest
+question_router = APIRouter()
+
+# OCR, embedding, database and Gemini clients are built on first use, see app/api/dependencies.py
+settings = get_settings()
+job_manager = JobManager(
+    max_workers=settings.INGEST_WORKERS,
+    max_jobs=settings.MAX_TRACKED_JOBS,
+    max_queued=settings.INGEST_MAX_QUEUE
+)
+# Bounds questions in flight; ingestion yields to it, see app/api/dependencies.py
+query_pool = services.get("query_pool")
+
+# Identical concurrent questions (same normalized text and scope) share one
+# embed -> retrieve -> generate run
+question_flights = SingleFlight("question")
+stream_flights = SingleFlight("question_stream")
+
+class QuestionRequest(BaseModel):
+    query: str
+    num_chunks: int = 5
+    # Restrict retrieval to these documents; searches everything when empty
+    file_names: Optional[List[str]] = None
+    # From POST /sessions; follow-ups in a session reuse its retrieved chunks
+    session_id: Optional[str] = Field(None, max_length=128)
 
-# Initialize services
-ocr_service = OCRService()
-text_processor = TextProcessor()
-db_service = DatabaseService()
-qa_service = QAService()
+def flight_key(query: str, num_chunks: int, file_names: Optional[List[str]], session_id: Optional[str] = None) -> str:
+    # Questions in a session depend on its history, so they only coalesce within it
+    return f"{normalize_query(query)}|{answer_scope(num_chunks, file_names)}|{session_id or ''}"
+
+def overloaded_error(e: Overloaded) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
 
 @router.get("/")
 async def root():
@@ -19,94 +69,407 @@ async def root():
 
 @router.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {"status": "healthy", "services": services.status()}
 
-@router.post("/upload-pdf")
+@router.post("/upload-pdf", status_code=202)
 async def upload_pdf(file: UploadFile = File(...)):
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="File must be a PDF")
     
+    # Spool to disk in blocks and hand ingestion off to the worker pool
     try:
-        # Read file content
-        file_content = await file.read()
-        
-        # Process PDF with OCR
-        markdown_text = await ocr_service.process_pdf(file_content, file.filename)
-        
-        # Process text and generate embeddings
-        chunks, embeddings = text_processor.process_text(markdown_text)
-        
-        # Prepare data for database
-        data = [
-            {
-                "text": chunk,
-                "embedding": embedding,
-                "metadata": {
-                    "file_name": file.filename,
-                    "chunk_id": i
-                }
-            }
-            for i, (chunk, embedding) in enumerate(zip(chunks, embeddings))
-        ]
-        
-        # Store in database
-        db_service.store_documents(data)
-        
-        return {
-            "message": "PDF processed successfully",
-            "num_chunks": len(chunks),
-            "file_name": file.filename
+        job_manager.admit()
+        upload = await spool_upload(file, settings.UPLOAD_SPOOL_DIR, settings.MAX_UPLOAD_BYTES)
+    except Overloaded as e:
+        raise overloaded_error(e)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    # A second upload of the same bytes while the first is still queued or
+    # running (e.g. a double click) attaches to that job
+    try:
+        job, created = job_manager.submit_once(f"{upload.content_hash}|{file.filename}", file.filename, run_ingestion, upload)
+    except Overloaded as e:
+        upload.discard()
+        raise overloaded_error(e)
+    if not created:
+        upload.discard()
+    
+    return {
+        "message": "PDF queued for processing" if created else "PDF is already being processed",
+        "job_id": job.id,
+        "file_name": file.filename
+    }
+
+@router.post("/upload-pdfs", status_code=202)
+async def upload_pdfs(files: List[UploadFile] = File(...)):
+    # Every file becomes its own ingestion job; the worker pool and the OCR
+    # slots bound how many are processed at once
+    jobs = []
+    job_ids = []
+    overloaded = None
+    for file in files:
+        if not file.filename.endswith('.pdf'):
+            jobs.append({"file_name": file.filename, "status": "rejected", "error": "File must be a PDF"})
+            continue
+        upload = None
+        try:
+            job_manager.admit()
+            upload = await spool_upload(file, settings.UPLOAD_SPOOL_DIR, settings.MAX_UPLOAD_BYTES)
+            job, created = job_manager.submit_once(f"{upload.content_hash}|{file.filename}", file.filename, run_ingestion, upload)
+        except Overloaded as e:
+            # Files past the queue limit are rejected; the rest still go through
+            if upload is not None:
+                upload.discard()
+            overloaded = e
+            jobs.append({"file_name": file.filename, "status": "rejected", "error": str(e), "retry_after": e.retry_after})
+            continue
+        except UploadTooLarge as e:
+            jobs.append({"file_name": file.filename, "status": "rejected", "error": str(e)})
+            continue
+        if not created:
+            upload.discard()
+        job_ids.append(job.id)
+        jobs.append({"file_name": file.filename, "status": job.status, "job_id": job.id})
+    
+    if overloaded is not None and not job_ids:
+        raise overloaded_error(overloaded)
+    
+    return {
+        "message": f"{len(job_ids)} of {len(files)} PDFs queued for processing",
+        "batch_id": job_manager.create_batch(job_ids),
+        "jobs": jobs
+    }
+
+@router.get("/batches/{batch_id}")
+async def get_batch(batch_id: str):
+    jobs = job_manager.get_batch(batch_id)
+    if jobs is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    statuses = [job.status for job in jobs]
+    return {
+        "batch_id": batch_id,
+        "completed": statuses.count("completed"),
+        "failed": statuses.count("failed"),
+        "pending": len(statuses) - statuses.count("completed") - statuses.count("failed"),
+        "jobs": [job.to_dict() for job in jobs]
+    }
+
+@router.get("/cache/stats")
+async def cache_stats():
+    # Services that have not been used yet have no stats and are not built for them
+    ocr_service = services.peek("ocr")
+    text_processor = services.peek("text_processor")
+    answer_cache = services.peek("answer_cache")
+    session_store = services.peek("sessions")
+    return {
+        "ocr": ocr_service.cache.stats() if ocr_service else None,
+        "embeddings": text_processor.embedding_cache.stats() if text_processor else None,
+        "answers": answer_cache.stats() if answer_cache else None,
+        "sessions": session_store.stats() if session_store else None
+    }
+
+@router.get("/admission/stats")
+async def admission_stats():
+    # Queue depths and mean service times, for sizing workers and limits
+    return {"query": query_pool.stats(), "ingest": job_manager.stats()}
+
+@router.post("/sessions")
+async def create_session(session_store=Depends(get_session_store)):
+    # Pass the id as session_id to /ask-question so follow-ups reuse retrieval
+    return {"session_id": session_store.create().session_id}
+
+@router.delete("/sessions/{session_id}")
+async def delete_session(session_id: str, session_store=Depends(get_session_store)):
+    session_store.delete(session_id)
+    return {"session_id": session_id, "deleted": True}
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+async def search(
+    db_service,
+    text_processor,
+    query: str,
+    query_embedding: List[float],
+    num_chunks: int,
+    file_names: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    if settings.HYBRID_SEARCH:
+        # Dense and BM25 candidates fused by reciprocal rank, so exact tokens
+        # (CVE ids, ports, tool names) reach the top-k
+        candidates = max(num_chunks, settings.HYBRID_CANDIDATES)
+        with span("vector_search"):
+            vector_results = await db_service.aquery_documents(
+                query_embedding=query_embedding,
+                match_count=candidates,
+                file_names=file_names
+            )
+        with span("keyword_search"):
+            # Off the event loop, like the dense query: ingestion holds the
+            # index lock while it adds a page's chunks
+            keyword_results = await asyncio.to_thread(
+                text_processor.keyword_index.search, query, candidates, file_names
+            )
+        return reciprocal_rank_fusion(
+            [vector_results, keyword_results],
+            k=settings.RRF_K,
+            limit=num_chunks
+        )
+    # Query database for relevant chunks
+    with span("vector_search"):
+        return await db_service.aquery_documents(
+            query_embedding=query_embedding,
+            match_count=num_chunks,
+            file_names=file_names
+        )
+
+async def retrieve_context(
+    db_service,
+    text_processor,
+    query: str,
+    query_embedding: List[float],
+    num_chunks: int,
+    file_names: Optional[List[str]] = None,
+    session: Optional[ConversationSession] = None
+):
+    with span("retrieve", hybrid=settings.HYBRID_SEARCH, session=session is not None):
+        if session is None:
+            results = await search(db_service, text_processor, query, query_embedding, num_chunks, file_names)
+        else:
+            results = await retrieve_with_session(
+                session,
+                query,
+                query_embedding,
+                num_chunks,
+                lambda text, embedding, limit: search(db_service, text_processor, text, embedding, limit, file_names),
+                text_processor.embedding_model.aembed_documents,
+                candidates=settings.SESSION_CANDIDATES,
+                max_candidates=settings.SESSION_MAX_CANDIDATES,
+                min_similarity=settings.SESSION_MIN_SIMILARITY,
+                history_weight=settings.SESSION_HISTORY_WEIGHT
+            )
+    
+    if not results:
+        return results, ""
+    
+    results = drop_duplicate_chunks(results, query_embedding)
+    
+    # Prepare context from results
+    with span("context", chunks=len(results)):
+        context, used_results = build_context(
+            results,
+            max_tokens=settings.MAX_CONTEXT_TOKENS,
+            merge=settings.CONTEXT_MERGE_ADJACENT
+        )
+    return used_results, context
+
+def drop_duplicate_chunks(results: List[Dict[str, Any]], query_embedding: List[float]) -> List[Dict[str, Any]]:
+    # Uses the embeddings returned by the store, so no chunk is re-embedded;
+    # they are dropped afterwards, as nothing downstream needs them
+    if len(results) >= 2 and settings.CONTEXT_DUPLICATE_THRESHOLD < 1:
+        with span("dedupe", chunks=len(results)):
+            results = drop_near_duplicates(
+                results,
+                query_embedding,
+                threshold=settings.CONTEXT_DUPLICATE_THRESHOLD,
+                diversity=settings.CONTEXT_MMR_DIVERSITY
+            )
+    return [{key: value for key, value in result.items() if key != "embedding"} for result in results]
+
+def format_sources(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "file_name": result['metadata']['file_name'],
+            "chunk_id": result['metadata']['chunk_id'],
+            "similarity": result.get('similarity', 0)
         }
-        
-    except Exception as e:
-        error_detail = str(e)
-        if not error_detail:
-            error_detail = f"An error occurred: {type(e).__name__}"
-        raise HTTPException(status_code=500, detail=error_detail)
+        for result in results
+    ]
 
-@router.post("/ask-question")
-async def ask_question(query: str, num_chunks: int = 5):
-    try:
-        print("hello")
+def http_error(e: Exception) -> HTTPException:
+    error_detail = str(e)
+    if not error_detail:
+        error_detail = f"An error occurred: {type(e).__name__}"
+    return HTTPException(status_code=500, detail=error_detail)
+
+def open_session(session_store, session_id: Optional[str], file_names: Optional[List[str]]) -> Optional[ConversationSession]:
+    if not session_id:
+        return None
+    return session_store.open(session_id, session_scope(file_names))
+
+def session_history(session: Optional[ConversationSession]) -> str:
+    return session.history(settings.SESSION_HISTORY_TURNS) if session is not None else ""
+
+def end_turn(session_store, session: Optional[ConversationSession], query: str, answer: str):
+    if session is not None:
+        session.add_turn(query, answer)
+        session_store.save(session)
+
+async def answer_question(
+    question: QuestionRequest,
+    text_processor,
+    db_service,
+    qa_service,
+    answer_cache,
+    session_store
+) -> Dict[str, Any]:
+    query, num_chunks, file_names = question.query, question.num_chunks, question.file_names
+    
+    async def respond():
+        async with query_pool.slot():
+            return await generate()
+    
+    async def generate():
+        session = open_session(session_store, question.session_id, file_names)
+        # A follow-up's answer depends on the turns before it, so only
+        # stateless questions and first turns use the answer cache
+        use_answer_cache = session is None or not session.turns
+        
         # Generate query embedding
-        query_embedding = text_processor.embedding_model.embed_query(query)
+        with span("embed_query"):
+            query_embedding = await text_processor.embedding_model.aembed_query(query)
         
-        # Query database for relevant chunks
-        results = db_service.query_documents(
-            query_embedding=query_embedding,
-            match_count=num_chunks
-        )
+        # Serve a stored answer for the same or a near-identical question
+        scope = answer_scope(num_chunks, file_names, query)
+        generation = answer_cache.generation
+        cached = answer_cache.lookup(query_embedding, scope) if use_answer_cache else None
+        if cached is not None:
+            end_turn(session_store, session, query, cached["answer"])
+            return {"answer": cached["answer"], "sources": cached["sources"], "cached": True}
         
+        results, context = await retrieve_context(db_service, text_processor, query, query_embedding, num_chunks, file_names, session)
         if not results:
             return {"message": "No relevant chunks found."}
         
-        # Prepare context from results
-        max_context_tokens = 15000
-        context = ""
-        for result in results:
-            chunk_text = f"Document: {result['metadata']['file_name']}, Chunk {result['metadata']['chunk_id']}:\n{result['text']}"
-            if len(context) + len(chunk_text) < max_context_tokens:
-                context += chunk_text + "\n\n"
-            else:
-                break
-        
         # Generate answer
-        answer = qa_service.generate_answer(query, context)
+        answer = await qa_service.generate_answer(query, context, session_history(session))
+        sources = format_sources(results)
+        if use_answer_cache:
+            answer_cache.store(query_embedding, answer, sources, scope, generation)
+        end_turn(session_store, session, query, answer)
         
         return {
             "answer": answer,
-            "sources": [
-                {
-                    "file_name": result['metadata']['file_name'],
-                    "chunk_id": result['metadata']['chunk_id'],
-                    "similarity": result.get('similarity', 0)
-                }
-                for result in results
-            ]
+            "sources": sources
         }
+    
+    try:
+        return await question_flights.do(flight_key(query, num_chunks, file_names, question.session_id), respond)
+    except Overloaded as e:
+        raise overloaded_error(e)
+    except Exception as e:
+        logger.exception("Error answering question")
+        raise http_error(e)
+
+async def stream_question(
+    question: QuestionRequest,
+    text_processor,
+    db_service,
+    qa_service,
+    answer_cache,
+    session_store
+) -> StreamingResponse:
+    query, num_chunks, file_names = question.query, question.num_chunks, question.file_names
+    key = flight_key(query, num_chunks, file_names, question.session_id)
+    
+    async def prepare():
+        # The slot is held until the answer has been streamed
+        release = await query_pool.acquire()
+        try:
+            session = open_session(session_store, question.session_id, file_names)
+            use_answer_cache = session is None or not session.turns
+            with span("embed_query"):
+                query_embedding = await text_processor.embedding_model.aembed_query(query)
+            scope = answer_scope(num_chunks, file_names, query)
+            generation = answer_cache.generation
+            cached = answer_cache.lookup(query_embedding, scope) if use_answer_cache else None
+            results, context = None, ""
+            if cached is None:
+                results, context = await retrieve_context(db_service, text_processor, query, query_embedding, num_chunks, file_names, session)
+        except BaseException:
+            release()
+            raise
+        return release, session, use_answer_cache, query_embedding, scope, generation, cached, results, context
+    
+    def event_stream(prepared):
+        release, session, use_answer_cache, query_embedding, scope, generation, cached, results, context = prepared
+        
+        async def events():
+            try:
+                async for event in answer_events(session, use_answer_cache, query_embedding, scope, generation, cached, results, context):
+                    yield event
+            finally:
+                release()
         
+        return events()
+    
+    async def answer_events(session, use_answer_cache, query_embedding, scope, generation, cached, results, context):
+        if cached is not None:
+            end_turn(session_store, session, query, cached["answer"])
+            yield format_sse("token", {"text": cached["answer"]})
+            yield format_sse("sources", {"sources": cached["sources"], "cached": True})
+        elif not results:
+            yield format_sse("message", {"text": "No relevant chunks found."})
+        else:
+            try:
+                # Forward tokens as soon as Gemini yields them
+                parts = []
+                async for text in qa_service.stream_answer(query, context, session_history(session)):
+                    parts.append(text)
+                    yield format_sse("token", {"text": text})
+                sources = format_sources(results)
+                if use_answer_cache:
+                    answer_cache.store(query_embedding, "".join(parts), sources, scope, generation)
+                end_turn(session_store, session, query, "".join(parts))
+                yield format_sse("sources", {"sources": sources})
+            except Exception as e:
+                logger.exception("Error streaming answer")
+                yield format_sse("error", {"detail": str(e) or f"An error occurred: {type(e).__name__}"})
+        yield format_sse("done", {})
+    
+    try:
+        # Identical streams in flight share one slot, one retrieval and one
+        # Gemini generation; late joiners replay the tokens sent so far.
+        # Overload and retrieval errors still surface as a 429 or 500 before
+        # the stream starts.
+        events = await stream_flights.prepared_stream(key, prepare, event_stream)
+    except Overloaded as e:
+        raise overloaded_error(e)
     except Exception as e:
-        error_detail = str(e)
-        if not error_detail:
-            error_detail = f"An error occurred: {type(e).__name__}"
-        raise HTTPException(status_code=500, detail=error_detail) 
\ No newline at end of file
+        logger.exception("Error preparing streamed answer")
+        raise http_error(e)
+    return StreamingResponse(events, media_type="text/event-stream")
+
+@question_router.post("/ask-question")
+async def ask_question(
+    query: str,
+    num_chunks: int = 5,
+    file_names: Optional[List[str]] = Query(None),
+    session_id: Optional[str] = Query(None, max_length=128),
+    text_processor=Depends(get_text_processor),
+    db_service=Depends(get_db_service),
+    qa_service=Depends(get_qa_service),
+    answer_cache=Depends(get_answer_cache),
+    session_store=Depends(get_session_store)
+):
+    question = QuestionRequest(query=query, num_chunks=num_chunks, file_names=file_names, session_id=session_id)
+    return await answer_question(question, text_processor, db_service, qa_service, answer_cache, session_store)
+
+@question_router.post("/ask-question/stream")
+async def ask_question_stream(
+    query: str,
+    num_chunks: int = 5,
+    file_names: Optional[List[str]] = Query(None),
+    session_id: Optional[str] = Query(None, max_length=128),
+    text_processor=Depends(get_text_processor),
+    db_service=Depends(get_db_service),
+    qa_service=Depends(get_qa_service),
+    answer_cache=Depends(get_answer_cache),
+    session_store=Depends(get_session_store)
+):
+    question = QuestionRequest(query=query, num_chunks=num_chunks, file_names=file_names, session_id=session_id)
+    return await stream_question(question, text_processor, db_service, qa_service, answer_cache, session_store)
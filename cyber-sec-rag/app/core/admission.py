@@ -0,0 +1,133 @@
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Deque, Dict
+
+from app.core.tracing import ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTED, ADMISSION_WAIT_SECONDS, span
+
+
+class Overloaded(Exception):
+    # A pool's queue is full; the API answers 429 with Retry-After
+    def __init__(self, pool: str, retry_after: int):
+        super().__init__(f"Too many {pool} requests queued, retry in {retry_after}s")
+        self.pool = pool
+        self.retry_after = retry_after
+
+
+def estimate_retry_after(mean_seconds: float, queued: int, concurrency: int) -> int:
+    # Time until the current queue has drained at the observed service time
+    return max(1, math.ceil(mean_seconds * (queued + 1) / max(1, concurrency)))
+
+
+class AdmissionPool:
+    # Bounded concurrency and a bounded FIFO queue for work on the server
+    # event loop. Callers past max_queue are rejected with Overloaded instead
+    # of piling up behind the provider quotas. Worker threads can watch
+    # idle to step aside while callers are queued.
+    def __init__(self, name: str, max_concurrency: int = 16, max_queue: int = 64):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Set while nobody is queued
+        self.idle = threading.Event()
+        self.idle.set()
+        # Moving average of how long a slot is held, for Retry-After
+        self.mean_seconds = 1.0
+        self.admitted = 0
+        self.rejected = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> Callable[[], None]:
+        # Returns the release function; calling it more than once is harmless
+        started = time.perf_counter()
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+        elif len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            ADMISSION_REJECTED.labels(self.name).inc()
+            raise Overloaded(self.name, estimate_retry_after(self.mean_seconds, len(self._waiters), self.max_concurrency))
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            self._update()
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # The slot was handed over just as the caller went away
+                    self._release()
+                elif waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    self._update()
+                raise
+        waited = time.perf_counter() - started
+        ADMISSION_WAIT_SECONDS.labels(self.name).observe(waited)
+        self.admitted += 1
+        self._update()
+        held_from = time.perf_counter()
+        released = False
+
+        def release():
+            nonlocal released
+            if released:
+                return
+            released = True
+            self.mean_seconds = 0.9 * self.mean_seconds + 0.1 * (time.perf_counter() - held_from)
+            self._release()
+
+        return release
+
+    @asynccontextmanager
+    async def slot(self):
+        release = await self.acquire()
+        try:
+            yield
+        finally:
+            release()
+
+    def _release(self):
+        # The slot passes straight to the next queued caller
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._update()
+                return
+        self.active -= 1
+        self._update()
+
+    def _update(self):
+        if self._waiters:
+            self.idle.clear()
+        else:
+            self.idle.set()
+        ADMISSION_QUEUE_DEPTH.labels(self.name).set(len(self._waiters))
+        ADMISSION_IN_FLIGHT.labels(self.name).set(self.active)
+
+    def yield_to(self, max_wait_seconds: float = 2.0):
+        # Called from ingestion threads before work that competes with this
+        # pool for provider quota; waits while callers are queued, but never
+        # longer than max_wait_seconds so ingestion cannot starve
+        if self.idle.is_set():
+            return
+        with span("yield_to_queries"):
+            self.idle.wait(max_wait_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.active,
+            "queued": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "mean_seconds": self.mean_seconds,
+        }
@@ -0,0 +1,52 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+
+class BulkWriter:
+    # Splits rows into batches, sends up to max_concurrency batches at once and
+    # retries each failed batch with exponential backoff and jitter
+    def __init__(
+        self,
+        insert_batch: Callable[[List[Dict[str, Any]]], Any],
+        batch_size: int = 200,
+        max_concurrency: int = 4,
+        max_retries: int = 3,
+        backoff_seconds: float = 0.5,
+    ):
+        self.insert_batch = insert_batch
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+
+    def write(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        batches = [rows[i:i + self.batch_size] for i in range(0, len(rows), self.batch_size)]
+        retries = 0
+        if batches:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as pool:
+                futures = [pool.submit(self._write_batch, index, batch) for index, batch in enumerate(batches)]
+                retries = sum(future.result() for future in futures)
+        seconds = time.perf_counter() - started
+        return {
+            "rows": len(rows),
+            "batches": len(batches),
+            "retries": retries,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(len(rows) / seconds, 1) if seconds > 0 else None,
+        }
+
+    def _write_batch(self, index: int, batch: List[Dict[str, Any]]) -> int:
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.insert_batch(batch)
+                return attempt
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise RuntimeError(
+                        f"Failed to store batch {index} ({len(batch)} rows) after {attempt + 1} attempts: {str(e)}"
+                    ) from e
+                time.sleep(self.backoff_seconds * (2 ** attempt) * (1 + random.random()))
+        return self.max_retries
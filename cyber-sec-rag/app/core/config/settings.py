@@ -3,10 +3,116 @@ from functools import lru_cache
 
 class Settings(BaseSettings):
     OPENAI_API_KEY: str
-    SUPABASE_URL: str
-    SUPABASE_KEY: str
+    SUPABASE_URL: str = ""
+    SUPABASE_KEY: str = ""
     MISTRAL_API_KEY: str
     GOOGLE_API_KEY: str
+
+    # Background ingestion
+    INGEST_WORKERS: int = 2
+    MAX_TRACKED_JOBS: int = 1000
+    INGEST_BUFFER_PAGES: int = 2
+    # Re-uploads only re-chunk and re-embed pages whose OCR text changed
+    INCREMENTAL_INGEST: bool = True
+    PAGE_MANIFEST_PATH: str = ".cache/page_manifest.sqlite3"
+    MAX_PARALLEL_OCR: int = 4
+
+    # Admission control: uploads past INGEST_MAX_QUEUE waiting jobs and
+    # questions past QUERY_MAX_QUEUE waiting requests get a 429; ingestion
+    # pauses embedding (up to INGEST_YIELD_MAX_SECONDS) while questions wait
+    INGEST_MAX_QUEUE: int = 32
+    QUERY_MAX_CONCURRENCY: int = 16
+    QUERY_MAX_QUEUE: int = 64
+    INGEST_YIELD_MAX_SECONDS: float = 2.0
+
+    # Uploads are spooled to disk; PDFs with more pages than OCR_SHARD_PAGES are
+    # OCR'd as page-range shards, OCR_SHARD_CONCURRENCY at a time per document
+    MAX_UPLOAD_BYTES: int = 200 * 1024 * 1024
+    UPLOAD_SPOOL_DIR: str = ".cache/uploads"
+    OCR_SHARD_PAGES: int = 50
+    OCR_SHARD_CONCURRENCY: int = 4
+
+    # OCR result cache
+    OCR_CACHE_PATH: str = ".cache/ocr_cache.sqlite3"
+    OCR_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # Embedding cache
+    EMBEDDING_MODEL: str = "text-embedding-3-small"
+    EMBEDDING_CACHE_PATH: str = ".cache/embedding_cache.sqlite3"
+    EMBEDDING_CACHE_MEMORY_SIZE: int = 10000
+    EMBEDDING_BATCH_SIZE: int = 512
+    # Query embeddings from concurrent requests are sent together: after the
+    # window, or as soon as the batch is full. 429s are retried with backoff.
+    QUERY_EMBED_WINDOW_MS: float = 5.0
+    QUERY_EMBED_MAX_BATCH: int = 64
+    EMBED_RATE_LIMIT_RETRIES: int = 5
+    EMBED_RATE_LIMIT_BACKOFF_SECONDS: float = 0.5
+
+    # Semantic chunking
+    CHUNK_BREAKPOINT_PERCENTILE: float = 95.0
+    CHUNK_MAX_CHARS: int = 1000
+    CHUNK_REEMBED: bool = False
+
+    # Vector store: "supabase", "local" or "quantized"
+    VECTOR_STORE_BACKEND: str = "supabase"
+    LOCAL_VECTOR_STORE_PATH: str = ".cache/vector_store"
+    EMBEDDING_DIM: int = 1536
+    IVF_NLIST: int = 0
+    IVF_NPROBE: int = 8
+    EXACT_SEARCH_LIMIT: int = 4096
+    # Quantized store: "int8" or "binary" codes, shortlist = match_count * factor
+    QUANTIZATION: str = "int8"
+    QUANTIZED_RERANK_FACTOR: int = 10
+    QUANTIZED_MIN_RERANK: int = 100
+
+    # Bulk chunk storage
+    STORE_BATCH_SIZE: int = 200
+    STORE_MAX_CONCURRENCY: int = 4
+    STORE_MAX_RETRIES: int = 3
+    STORE_RETRY_BACKOFF_SECONDS: float = 0.5
+
+    # Hybrid retrieval (BM25 + vector, fused with reciprocal rank fusion)
+    HYBRID_SEARCH: bool = True
+    BM25_INDEX_PATH: str = ".cache/bm25_index.jsonl"
+    HYBRID_CANDIDATES: int = 20
+    RRF_K: int = 60
+
+    # Prompt context budget and post-processing
+    MAX_CONTEXT_TOKENS: int = 15000
+    CONTEXT_MERGE_ADJACENT: bool = True
+    # Retrieved chunks this similar to a more relevant one are dropped; 1.0 disables
+    CONTEXT_DUPLICATE_THRESHOLD: float = 0.95
+    CONTEXT_MMR_DIVERSITY: float = 0.3
+
+    # Semantic answer cache
+    ANSWER_CACHE_THRESHOLD: float = 0.95
+    ANSWER_CACHE_TTL_SECONDS: float = 3600
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000
+
+    # Conversation sessions: follow-ups are ranked against the chunks already
+    # retrieved for the session before falling back to a full search
+    SESSION_TTL_SECONDS: float = 1800
+    SESSION_MAX_SESSIONS: int = 10000
+    SESSION_CANDIDATES: int = 20
+    SESSION_MAX_CANDIDATES: int = 100
+    SESSION_MIN_SIMILARITY: float = 0.4
+    SESSION_HISTORY_WEIGHT: float = 0.5
+    SESSION_HISTORY_TURNS: int = 3
+
+    # Shared async provider clients (OpenAI, Mistral, Supabase, Gemini)
+    HTTP_TIMEOUT_SECONDS: float = 60.0
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    OCR_TIMEOUT_SECONDS: float = 300.0
+
+    # Observability: stage spans are logged at DEBUG, /metrics serves histograms
+    LOG_LEVEL: str = "INFO"
+
+    # Startup: services are built lazily; a warning is logged past the budget
+    STARTUP_BUDGET_SECONDS: float = 2.0
+    WARM_SERVICES_ON_STARTUP: bool = False
     
     class Config:
         env_file = ".env"
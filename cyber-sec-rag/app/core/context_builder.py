@@ -0,0 +1,201 @@
+import logging
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.vectors import normalize
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SEPARATOR = "\n\n"
+# Shorter matches between a chunk's tail and the next chunk's head are
+# treated as coincidence rather than chunk overlap
+MIN_OVERLAP_CHARS = 20
+
+
+# Retry a failed tiktoken load after this long instead of falling back for
+# the life of the process
+ENCODING_RETRY_SECONDS = 60.0
+
+_encoding = None
+_encoding_lock = threading.Lock()
+_encoding_loading = False
+_encoding_failed_at: Optional[float] = None
+
+
+def load_encoding():
+    # Blocking: tiktoken downloads its BPE ranks on first use. Runs on a
+    # background thread, started by get_encoding() or at startup. Imported
+    # here so the API process does not load tiktoken on import.
+    global _encoding, _encoding_loading, _encoding_failed_at
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        logger.warning("Could not load the tiktoken encoding; estimating tokens as len // 4", exc_info=True)
+        with _encoding_lock:
+            _encoding_loading = False
+            _encoding_failed_at = time.monotonic()
+        return None
+    with _encoding_lock:
+        _encoding = encoding
+        _encoding_loading = False
+    return encoding
+
+
+def get_encoding():
+    # Never blocks: returns None, and starts a load in the background, until
+    # the encoding is available
+    global _encoding_loading
+    if _encoding is not None:
+        return _encoding
+    with _encoding_lock:
+        retry = _encoding_failed_at is None or time.monotonic() - _encoding_failed_at >= ENCODING_RETRY_SECONDS
+        if _encoding is None and not _encoding_loading and retry:
+            _encoding_loading = True
+            threading.Thread(target=load_encoding, name="load-tiktoken", daemon=True).start()
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    # Four characters per token until tiktoken has loaded
+    encoding = get_encoding()
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def format_chunk(result: Dict[str, Any]) -> str:
+    return f"Document: {result['metadata']['file_name']}, Chunk {result['metadata']['chunk_id']}:\n{result['text']}"
+
+
+def strip_overlap(previous: str, text: str, max_overlap: int = 1000) -> str:
+    # Drops the head of text that repeats the tail of previous
+    tail = previous[-max_overlap:]
+    probe = text[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return text
+    start = tail.find(probe)
+    while start != -1:
+        if text.startswith(tail[start:]):
+            return text[len(tail) - start:].lstrip()
+        start = tail.find(probe, start + 1)
+    return text
+
+
+def document_order(result: Dict[str, Any]):
+    metadata = result["metadata"]
+    return metadata.get("file_name") or "", metadata.get("page", 0), metadata.get("chunk_id", 0)
+
+
+def merge_adjacent(results: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    # Groups chunks with consecutive chunk ids of the same file into spans, in
+    # document order
+    spans: List[List[Dict[str, Any]]] = []
+    for result in sorted(results, key=document_order):
+        if spans:
+            last = spans[-1][-1]["metadata"]
+            metadata = result["metadata"]
+            if last.get("file_name") == metadata.get("file_name") and last.get("chunk_id") + 1 == metadata.get("chunk_id"):
+                spans[-1].append(result)
+                continue
+        spans.append([result])
+    return spans
+
+
+def format_span(span: List[Dict[str, Any]]) -> str:
+    if len(span) == 1:
+        return format_chunk(span[0])
+    texts = [span[0]["text"]]
+    for previous, result in zip(span, span[1:]):
+        texts.append(strip_overlap(previous["text"], result["text"]))
+    first, last = span[0]["metadata"], span[-1]["metadata"]
+    return f"Document: {first['file_name']}, Chunks {first['chunk_id']}-{last['chunk_id']}:\n" + " ".join(texts)
+
+
+def shingles(text: str, size: int = 3) -> set:
+    words = re.findall(r"\w+", text.lower())
+    return {tuple(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+
+def drop_near_duplicates(
+    results: List[Dict[str, Any]],
+    query_embedding: List[float],
+    threshold: float = 0.95,
+    diversity: float = 0.3,
+) -> List[Dict[str, Any]]:
+    # Maximal marginal relevance: repeatedly take the chunk most similar to the
+    # query and least similar to those already taken; chunks whose similarity
+    # to a taken one reaches threshold add nothing and are dropped.
+    # Similarities use the embeddings the store returned with each result.
+    # Keyword-only hits have none; they are compared by word shingle overlap
+    # and rank just below the least relevant dense hit.
+    if len(results) < 2:
+        return results
+    n = len(results)
+    has_vector = np.array([result.get("embedding") is not None for result in results])
+    relevance = np.zeros(n, dtype=np.float32)
+    pairwise = np.zeros((n, n), dtype=np.float32)
+    if has_vector.any():
+        dense = np.flatnonzero(has_vector)
+        chunks = normalize(np.asarray([results[i]["embedding"] for i in dense], dtype=np.float32))
+        query = normalize(np.asarray([query_embedding], dtype=np.float32))[0]
+        relevance[dense] = chunks @ query
+        pairwise[np.ix_(dense, dense)] = chunks @ chunks.T
+    sparse = np.flatnonzero(~has_vector)
+    if len(sparse):
+        floor = relevance[has_vector].min() if has_vector.any() else 1.0
+        # In retrieval order, which is already by relevance
+        relevance[sparse] = floor - (np.arange(len(sparse)) + 1) / (len(sparse) + 1)
+        words = {i: shingles(results[i]["text"]) for i in range(n)}
+        for i in sparse:
+            for j in range(n):
+                if i != j:
+                    overlap = len(words[i] & words[j]) / len(words[i] | words[j])
+                    pairwise[i, j] = pairwise[j, i] = overlap
+    remaining = list(range(n))
+    taken: List[int] = []
+    while remaining:
+        if taken:
+            redundancy = pairwise[np.ix_(remaining, taken)].max(axis=1)
+        else:
+            redundancy = np.zeros(len(remaining), dtype=np.float32)
+        scores = (1 - diversity) * relevance[remaining] - diversity * redundancy
+        best = int(np.argmax(scores))
+        index = remaining.pop(best)
+        if redundancy[best] < threshold:
+            taken.append(index)
+    return [results[i] for i in taken]
+
+
+def build_context(
+    results: List[Dict[str, Any]],
+    max_tokens: int = 15000,
+    merge: bool = True
+) -> Tuple[str, List[Dict[str, Any]]]:
+    # Neighbouring chunks of one file are merged into a single span without
+    # their overlapping text. Each span is tokenized once, packed greedily by
+    # relevance per token, then emitted in document order with a single join.
+    relevance = {
+        id(result): result.get("rrf_score", result.get("similarity", 1.0 / (rank + 1)))
+        for rank, result in enumerate(results)
+    }
+    spans = merge_adjacent(results) if merge else [[result] for result in results]
+    pieces = [format_span(span) for span in spans]
+    separator_tokens = count_tokens(CHUNK_SEPARATOR)
+    costs = [count_tokens(piece) + separator_tokens for piece in pieces]
+    scores = [max(relevance[id(result)] for result in span) for span in spans]
+
+    chosen = []
+    used = 0
+    for i in sorted(range(len(pieces)), key=lambda i: scores[i] / costs[i], reverse=True):
+        if used + costs[i] <= max_tokens:
+            chosen.append(i)
+            used += costs[i]
+    chosen.sort()
+
+    context = CHUNK_SEPARATOR.join(pieces[i] for i in chosen)
+    return context, [result for i in chosen for result in spans[i]]
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import random
+from typing import Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+from langchain_core.embeddings import Embeddings
+
+from app.core.http_clients import ProviderClients
+from app.core.tracing import QUERY_EMBED_BATCH_SIZE, span
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def retry_after_seconds(e: Exception) -> Optional[float]:
+    # Rate-limit errors from openai/httpx carry the status code, and usually a
+    # Retry-After header, on the exception or its response
+    response = getattr(e, "response", None)
+    status_code = getattr(e, "status_code", None) or getattr(response, "status_code", None)
+    if status_code != 429 and type(e).__name__ != "RateLimitError":
+        return None
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class BatchedEmbeddings(Embeddings):
+    # Collects embed_query calls from concurrent requests for up to window_seconds
+    # (or until max_batch texts are waiting) and sends them as one
+    # embed_documents call. The queue lives on the provider loop, so requests
+    # on the server loop and ingestion threads all share it. Rate-limited calls
+    # are retried with exponential backoff, honouring Retry-After.
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        providers: ProviderClients,
+        window_seconds: float = 0.005,
+        max_batch: int = 64,
+        max_retries: int = 5,
+        backoff_seconds: float = 0.5,
+        max_backoff_seconds: float = 30.0,
+    ):
+        self.embeddings = embeddings
+        self.providers = providers
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        # Only touched on the provider loop
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.providers.run(self._with_backoff(lambda: self.embeddings.aembed_documents(texts)))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.providers.run(self._enqueue(text))
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Document batches are already sized by the chunker; they only get the backoff
+        return await self.providers.call(self._with_backoff(lambda: self.embeddings.aembed_documents(texts)))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.providers.call(self._enqueue(text))
+
+    async def _enqueue(self, text: str) -> List[float]:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window_seconds, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._send(batch))
+
+    async def _send(self, batch: List[Tuple[str, asyncio.Future]]):
+        # Identical texts in one window are embedded once
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        QUERY_EMBED_BATCH_SIZE.observe(len(batch))
+        try:
+            with span("embed_query_batch", texts=len(texts), requests=len(batch)):
+                vectors = await self._with_backoff(lambda: self.embeddings.aembed_documents(texts))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        by_text = dict(zip(texts, vectors))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+
+    async def _with_backoff(self, call: Callable[[], Awaitable[T]]) -> T:
+        attempt = 0
+        while True:
+            try:
+                return await call()
+            except Exception as e:
+                retry_after = retry_after_seconds(e)
+                if retry_after is None or attempt >= self.max_retries:
+                    raise
+                delay = min(self.max_backoff_seconds, max(retry_after, self.backoff_seconds * 2 ** attempt))
+                # Jitter keeps workers that were limited together from retrying together
+                delay *= 1 + random.random() * 0.1
+                attempt += 1
+                logger.warning("Embedding rate limited, retry %d/%d in %.2fs", attempt, self.max_retries, delay)
+                await asyncio.sleep(delay)
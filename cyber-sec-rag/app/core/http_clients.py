@@ -0,0 +1,111 @@
+import asyncio
+import concurrent.futures
+import threading
+from typing import AsyncIterable, AsyncIterator, Awaitable, List, TypeVar
+
+import httpx
+from langchain_core.embeddings import Embeddings
+
+T = TypeVar("T")
+
+
+def create_http_client(
+    timeout: float = 60.0,
+    connect_timeout: float = 5.0,
+    max_connections: int = 100,
+    max_keepalive_connections: int = 20,
+    keepalive_expiry: float = 30.0,
+) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(timeout, connect=connect_timeout),
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+    )
+
+
+class ProviderClients:
+    # One event loop thread owns every provider client and its connection pool.
+    # Request handlers await calls on it from the server loop; ingestion worker
+    # threads block on the same calls, so both share keep-alive connections.
+    def __init__(
+        self,
+        timeout: float = 60.0,
+        ocr_timeout: float = 300.0,
+        connect_timeout: float = 5.0,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+    ):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="provider-io", daemon=True)
+        self._thread.start()
+        pool = {
+            "connect_timeout": connect_timeout,
+            "max_connections": max_connections,
+            "max_keepalive_connections": max_keepalive_connections,
+            "keepalive_expiry": keepalive_expiry,
+        }
+        self.openai_http = create_http_client(timeout=timeout, **pool)
+        # OCR of a long PDF can take minutes
+        self.mistral_http = create_http_client(timeout=ocr_timeout, **pool)
+        self.timeout = timeout
+
+    def run(self, coro: Awaitable[T]) -> T:
+        # For worker threads; blocks until the coroutine finishes on the provider loop
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("ProviderClients.run() called from the provider loop; await call() instead")
+        return self.submit(coro).result()
+
+    def submit(self, coro: Awaitable[T]) -> "concurrent.futures.Future[T]":
+        # Starts the coroutine on the provider loop without waiting for it
+        return asyncio.run_coroutine_threadsafe(self._wrap(coro), self.loop)
+
+    async def call(self, coro: Awaitable[T]) -> T:
+        # For coroutines on any other loop; cancelling the caller cancels the call
+        if asyncio.get_running_loop() is self.loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._wrap(coro), self.loop))
+
+    async def iterate(self, iterable: AsyncIterable[T]) -> AsyncIterator[T]:
+        # Streams an async iterator owned by the provider loop (e.g. Gemini tokens)
+        iterator = iterable.__aiter__()
+        while True:
+            try:
+                item = await self.call(iterator.__anext__())
+            except StopAsyncIteration:
+                return
+            yield item
+
+    async def aclose(self):
+        async def close_clients():
+            await self.openai_http.aclose()
+            await self.mistral_http.aclose()
+        await self.call(close_clients())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    @staticmethod
+    async def _wrap(awaitable: Awaitable[T]) -> T:
+        return await awaitable
+
+
+class LoopBoundEmbeddings(Embeddings):
+    # Routes both the sync and async embedding calls of a LangChain model
+    # through its async client on the provider loop
+    def __init__(self, embeddings: Embeddings, providers: ProviderClients):
+        self.embeddings = embeddings
+        self.providers = providers
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.providers.run(self.embeddings.aembed_documents(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.providers.run(self.embeddings.aembed_query(text))
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.providers.call(self.embeddings.aembed_documents(texts))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.providers.call(self.embeddings.aembed_query(text))
@@ -0,0 +1,198 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.admission import Overloaded, estimate_retry_after
+from app.core.tracing import (
+    ADMISSION_IN_FLIGHT,
+    ADMISSION_QUEUE_DEPTH,
+    ADMISSION_REJECTED,
+    ADMISSION_WAIT_SECONDS,
+    COALESCED_REQUESTS,
+    bind_request_id,
+    current_request_id,
+)
+
+INGESTION_STAGES = ["ocr", "chunk", "embed", "store"]
+
+
+class Job:
+    def __init__(self, file_name: str, stages: List[str]):
+        self.id = uuid.uuid4().hex
+        self.file_name = file_name
+        # Id of the request that queued the job, carried into its spans
+        self.request_id = current_request_id()
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.stages: Dict[str, Dict[str, Any]] = {
+            stage: {"status": "pending", "completed": 0, "started_at": None, "finished_at": None}
+            for stage in stages
+        }
+        self._lock = threading.Lock()
+
+    def start_stage(self, name: str):
+        with self._lock:
+            stage = self.stages[name]
+            stage["status"] = "running"
+            stage["started_at"] = time.time()
+
+    def finish_stage(self, name: str, status: str = "completed"):
+        with self._lock:
+            stage = self.stages[name]
+            stage["status"] = status
+            stage["finished_at"] = time.time()
+
+    def advance(self, name: str, count: int = 1):
+        # Record items (pages, chunks, rows) a stage has finished
+        with self._lock:
+            self.stages[name]["completed"] += count
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "file_name": self.file_name,
+                "request_id": self.request_id,
+                "status": self.status,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "result": self.result,
+                "error": self.error,
+            }
+
+
+class JobManager:
+    # Runs jobs on a fixed worker pool. At most max_queued jobs wait for a
+    # worker; past that, submissions raise Overloaded so uploads get a 429
+    # instead of an ever-growing backlog.
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_jobs: int = 1000,
+        stages: List[str] = INGESTION_STAGES,
+        max_queued: Optional[int] = None,
+    ):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._max_workers = max_workers
+        self._max_queued = max_queued
+        self._queued = 0
+        self._running = 0
+        # Moving average of job run time, for Retry-After
+        self._mean_seconds = 30.0
+        self.rejected = 0
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._batches: "OrderedDict[str, List[str]]" = OrderedDict()
+        # Queued or running jobs by dedupe key, see submit_once()
+        self._active: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._max_jobs = max_jobs
+        self._stages = stages
+
+    def admit(self):
+        # Checks for room before the caller does expensive work (e.g. spooling
+        # an upload to disk); submit_once() checks again
+        with self._lock:
+            self._check_queue()
+
+    def submit_once(self, key: str, file_name: str, fn: Callable[..., Dict[str, Any]], *args: Any) -> Tuple[Job, bool]:
+        # Attaches to the queued or running job with the same key (e.g. a
+        # double-clicked upload) instead of starting another; returns the job
+        # and whether it was newly created
+        with self._lock:
+            job = self._active.get(key)
+            if job is not None:
+                COALESCED_REQUESTS.labels("upload", "follower").inc()
+                return job, False
+            self._check_queue()
+            job = Job(file_name, self._stages)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            self._enqueued()
+            self._evict()
+        COALESCED_REQUESTS.labels("upload", "leader").inc()
+        self._executor.submit(self._run, job, fn, *args, key=key)
+        return job, True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def create_batch(self, job_ids: List[str]) -> str:
+        # Group jobs submitted together (e.g. a multi-file upload) under one id
+        batch_id = uuid.uuid4().hex
+        with self._lock:
+            self._batches[batch_id] = list(job_ids)
+            while len(self._batches) > self._max_jobs:
+                self._batches.popitem(last=False)
+        return batch_id
+
+    def get_batch(self, batch_id: str) -> Optional[List[Job]]:
+        with self._lock:
+            job_ids = self._batches.get(batch_id)
+            if job_ids is None:
+                return None
+            return [self._jobs[job_id] for job_id in job_ids if job_id in self._jobs]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight": self._running,
+                "queued": self._queued,
+                "max_concurrency": self._max_workers,
+                "max_queue": self._max_queued,
+                "rejected": self.rejected,
+                "mean_seconds": self._mean_seconds,
+            }
+
+    def _check_queue(self):
+        if self._max_queued is not None and self._queued >= self._max_queued:
+            self.rejected += 1
+            ADMISSION_REJECTED.labels("ingest").inc()
+            raise Overloaded("ingest", estimate_retry_after(self._mean_seconds, self._queued, self._max_workers))
+
+    def _enqueued(self):
+        self._queued += 1
+        ADMISSION_QUEUE_DEPTH.labels("ingest").set(self._queued)
+
+    def _run(self, job: Job, fn: Callable[..., Dict[str, Any]], *args: Any, key: Optional[str] = None):
+        job.status = "running"
+        job.started_at = time.time()
+        ADMISSION_WAIT_SECONDS.labels("ingest").observe(job.started_at - job.created_at)
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            ADMISSION_QUEUE_DEPTH.labels("ingest").set(self._queued)
+            ADMISSION_IN_FLIGHT.labels("ingest").set(self._running)
+        try:
+            with bind_request_id(job.request_id):
+                job.result = fn(job, *args)
+            job.status = "completed"
+        except Exception as e:
+            job.error = str(e) or f"An error occurred: {type(e).__name__}"
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._running -= 1
+                self._mean_seconds = 0.9 * self._mean_seconds + 0.1 * (job.finished_at - job.started_at)
+                ADMISSION_IN_FLIGHT.labels("ingest").set(self._running)
+                if key is not None and self._active.get(key) is job:
+                    del self._active[key]
+
+    def _evict(self):
+        # Drop the oldest finished jobs once the registry is full
+        if len(self._jobs) <= self._max_jobs:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.status in ("completed", "failed")]:
+            if len(self._jobs) <= self._max_jobs:
+                break
+            del self._jobs[job_id]
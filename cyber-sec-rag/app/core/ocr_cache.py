@@ -0,0 +1,150 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class OCRCache:
+    def __init__(self, path: str, max_bytes: int):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        # Hashes with a streaming write in progress
+        self._writing = set()
+        with self._lock:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    hash TEXT PRIMARY KEY,
+                    size_bytes INTEGER NOT NULL,
+                    ocr_seconds REAL NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS pages (
+                    hash TEXT NOT NULL,
+                    page_index INTEGER NOT NULL,
+                    markdown TEXT NOT NULL,
+                    PRIMARY KEY (hash, page_index)
+                );
+                """
+            )
+            # Pages of documents whose OCR never finished
+            self._conn.execute("DELETE FROM pages WHERE hash NOT IN (SELECT hash FROM documents)")
+            self._conn.commit()
+
+    def get(self, content_hash: str) -> Optional[Iterator[str]]:
+        # Pages are read lazily in batches, so a cached 1000-page document is
+        # never loaded at once
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT ocr_seconds FROM documents WHERE hash = ?", (content_hash,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE documents SET last_access = ? WHERE hash = ?", (time.time(), content_hash)
+            )
+            self._conn.commit()
+            self.hits += 1
+            self.saved_seconds += row[0]
+        return self._iter_pages(content_hash)
+
+    def _iter_pages(self, content_hash: str, batch_size: int = 64) -> Iterator[str]:
+        start = 0
+        while True:
+            with self._lock:
+                batch = [
+                    markdown
+                    for (markdown,) in self._conn.execute(
+                        "SELECT markdown FROM pages WHERE hash = ? AND page_index >= ? ORDER BY page_index LIMIT ?",
+                        (content_hash, start, batch_size),
+                    )
+                ]
+            yield from batch
+            if len(batch) < batch_size:
+                return
+            start += batch_size
+
+    # Streaming writes: pages are added as OCR shards finish and only become
+    # visible to get() once commit() records the document. Only one job writes
+    # a hash at a time; begin() returns False to any other, which then OCRs
+    # without caching instead of clearing the first job's pages.
+
+    def begin(self, content_hash: str) -> bool:
+        with self._lock:
+            if content_hash in self._writing:
+                return False
+            self._writing.add(content_hash)
+            self._conn.execute("DELETE FROM documents WHERE hash = ?", (content_hash,))
+            self._conn.execute("DELETE FROM pages WHERE hash = ?", (content_hash,))
+            self._conn.commit()
+            return True
+
+    def add_pages(self, content_hash: str, first_index: int, pages: List[str]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO pages (hash, page_index, markdown) VALUES (?, ?, ?)",
+                [(content_hash, first_index + i, page) for i, page in enumerate(pages)],
+            )
+            self._conn.commit()
+
+    def commit(self, content_hash: str, ocr_seconds: float):
+        with self._lock:
+            size_bytes = self._conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(CAST(markdown AS BLOB))), 0) FROM pages WHERE hash = ?", (content_hash,)
+            ).fetchone()[0]
+            if size_bytes > self.max_bytes:
+                self._conn.execute("DELETE FROM pages WHERE hash = ?", (content_hash,))
+            else:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO documents (hash, size_bytes, ocr_seconds, last_access) VALUES (?, ?, ?, ?)",
+                    (content_hash, size_bytes, ocr_seconds, time.time()),
+                )
+                self._evict()
+            self._conn.commit()
+            self._writing.discard(content_hash)
+
+    def abort(self, content_hash: str):
+        # Drops the pages of a write that did not finish
+        with self._lock:
+            self._conn.execute("DELETE FROM pages WHERE hash = ?", (content_hash,))
+            self._conn.commit()
+            self._writing.discard(content_hash)
+
+    def _evict(self):
+        # Drop least recently used documents until the cache fits its budget
+        total = self._conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM documents").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for content_hash, size_bytes in self._conn.execute(
+            "SELECT hash, size_bytes FROM documents ORDER BY last_access"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM pages WHERE hash = ?", (content_hash,))
+            self._conn.execute("DELETE FROM documents WHERE hash = ?", (content_hash,))
+            total -= size_bytes
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM documents"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "size_bytes": size_bytes,
+            "max_bytes": self.max_bytes,
+            "saved_ocr_seconds": round(self.saved_seconds, 3),
+        }
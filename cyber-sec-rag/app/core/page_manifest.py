@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Tuple
+
+
+class PageManifest:
+    # Remembers the content hash and stored chunk ids of every OCR page per
+    # document, so a re-upload only re-chunks and re-embeds the pages that changed
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    file_name TEXT PRIMARY KEY,
+                    next_chunk_id INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS pages (
+                    file_name TEXT NOT NULL,
+                    page_index INTEGER NOT NULL,
+                    hash TEXT NOT NULL,
+                    chunk_ids TEXT NOT NULL,
+                    PRIMARY KEY (file_name, page_index)
+                );
+                """
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def hash_page(markdown: str) -> str:
+        return hashlib.sha256(markdown.encode("utf-8")).hexdigest()
+
+    def contains(self, file_name: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM documents WHERE file_name = ?", (file_name,)
+            ).fetchone() is not None
+
+    def pages(self, file_name: str) -> Dict[int, Tuple[str, List[int]]]:
+        with self._lock:
+            return {
+                page_index: (page_hash, json.loads(chunk_ids))
+                for page_index, page_hash, chunk_ids in self._conn.execute(
+                    "SELECT page_index, hash, chunk_ids FROM pages WHERE file_name = ?", (file_name,)
+                )
+            }
+
+    def next_chunk_id(self, file_name: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT next_chunk_id FROM documents WHERE file_name = ?", (file_name,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def put_page(self, file_name: str, page_index: int, page_hash: str, chunk_ids: List[int], next_chunk_id: int):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (file_name, page_index, hash, chunk_ids) VALUES (?, ?, ?, ?)",
+                (file_name, page_index, page_hash, json.dumps(chunk_ids)),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (file_name, next_chunk_id) VALUES (?, ?)",
+                (file_name, next_chunk_id),
+            )
+            self._conn.commit()
+
+    def remove_pages(self, file_name: str, page_indexes: List[int]):
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM pages WHERE file_name = ? AND page_index = ?",
+                [(file_name, page_index) for page_index in page_indexes],
+            )
+            self._conn.commit()
+
+    def remove_document(self, file_name: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM pages WHERE file_name = ?", (file_name,))
+            self._conn.execute("DELETE FROM documents WHERE file_name = ?", (file_name,))
+            self._conn.commit()
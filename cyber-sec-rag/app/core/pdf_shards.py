@@ -0,0 +1,101 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Iterator, List, Tuple
+
+from app.core.http_clients import ProviderClients
+from app.core.tracing import record
+
+logger = logging.getLogger(__name__)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def split_pdf(path: str, pages_per_shard: int, directory: str) -> Iterator[Tuple[str, bool]]:
+    # Yields (path, owned) per page range in order; owned shards are temporary
+    # files the caller deletes. Small or unreadable PDFs are yielded whole.
+    try:
+        from pypdf import PdfReader, PdfWriter
+        total = len(PdfReader(path).pages)
+    except ImportError:
+        yield path, False
+        return
+    except Exception as e:
+        logger.info("Cannot split %s, sending it whole: %s", path, e)
+        yield path, False
+        return
+    if total <= pages_per_shard:
+        yield path, False
+        return
+    os.makedirs(directory, exist_ok=True)
+    for start in range(0, total, pages_per_shard):
+        # A fresh reader per shard keeps pypdf's object cache to one page range
+        reader = PdfReader(path)
+        writer = PdfWriter()
+        for index in range(start, min(start + pages_per_shard, total)):
+            writer.add_page(reader.pages[index])
+        fd, shard_path = tempfile.mkstemp(suffix=".pdf", dir=directory)
+        with os.fdopen(fd, "wb") as f:
+            writer.write(f)
+        yield shard_path, True
+
+
+def ocr_in_shards(
+    path: str,
+    file_name: str,
+    ocr_file: Callable[[str, str], Awaitable[List[str]]],
+    providers: ProviderClients,
+    slots: threading.BoundedSemaphore,
+    pages_per_shard: int = 50,
+    window: int = 4,
+    directory: str = ".cache/uploads",
+) -> Iterator[Tuple[List[str], float]]:
+    # OCRs page-range shards concurrently on the provider loop and yields their
+    # pages (with the shard's OCR seconds) in document order. At most `window` shards of one document are in
+    # flight or waiting to be consumed; `slots` bounds OCR calls process-wide.
+    pending = deque()
+
+    async def run(shard_path: str, owned: bool, index: int):
+        started = time.perf_counter()
+        try:
+            pages = await ocr_file(shard_path, f"part{index}-{file_name}" if owned else file_name)
+            return pages, time.perf_counter() - started
+        finally:
+            if owned:
+                _remove(shard_path)
+
+    def take():
+        future, shard_path, owned, index = pending.popleft()
+        try:
+            pages, seconds = future.result()
+        except Exception:
+            record("ocr", 0.0, "error", file_name=file_name, shard=index)
+            raise
+        record("ocr", seconds, file_name=file_name, shard=index, pages=len(pages))
+        return pages, seconds
+
+    try:
+        for index, (shard_path, owned) in enumerate(split_pdf(path, pages_per_shard, directory)):
+            slots.acquire()
+            future = providers.submit(run(shard_path, owned, index))
+            future.add_done_callback(lambda _: slots.release())
+            pending.append((future, shard_path, owned, index))
+            # Only yield once every shard written so far is submitted, so an
+            # early close never leaves a shard file behind
+            if len(pending) >= window:
+                yield take()
+        while pending:
+            yield take()
+    finally:
+        # The consumer stopped early or a shard failed
+        for future, shard_path, owned, index in pending:
+            if future.cancel() and owned:
+                _remove(shard_path)
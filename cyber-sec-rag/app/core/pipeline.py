@@ -0,0 +1,85 @@
+import contextvars
+import queue
+import threading
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+from app.core.jobs import Job
+
+_DONE = object()
+
+
+def run_pipeline(
+    source: Tuple[str, Iterable[Any]],
+    stages: List[Tuple[str, Callable[[Any], Any]]],
+    buffer_size: int = 2,
+    job: Optional[Job] = None,
+):
+    # Each stage runs on its own thread and hands items to the next one through
+    # a bounded queue, so at most buffer_size items wait between two stages.
+    # The source is consumed on the calling thread.
+    queues = [queue.Queue(maxsize=buffer_size) for _ in stages]
+    errors: List[BaseException] = []
+    failed = threading.Event()
+
+    def work(index: int, name: str, fn: Callable[[Any], Any]):
+        inbox = queues[index]
+        outbox = queues[index + 1] if index + 1 < len(queues) else None
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                break
+            if failed.is_set():
+                # Keep draining so upstream stages never block on a full queue
+                continue
+            try:
+                result = fn(item)
+                if job is not None:
+                    job.advance(name)
+            except BaseException as e:
+                errors.append(e)
+                failed.set()
+                continue
+            if outbox is not None:
+                outbox.put(result)
+        if outbox is not None:
+            outbox.put(_DONE)
+        if job is not None:
+            job.finish_stage(name, status="failed" if failed.is_set() else "completed")
+
+    if job is not None:
+        for name in [source[0]] + [name for name, _ in stages]:
+            job.start_stage(name)
+
+    # Stage threads run in a copy of the caller's context so spans keep its request id
+    threads = [
+        threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(work, index, name, fn),
+            name=f"pipeline-{name}",
+            daemon=True
+        )
+        for index, (name, fn) in enumerate(stages)
+    ]
+    for thread in threads:
+        thread.start()
+
+    source_name, items = source
+    try:
+        for item in items:
+            if failed.is_set():
+                break
+            queues[0].put(item)
+            if job is not None:
+                job.advance(source_name)
+    except BaseException as e:
+        errors.append(e)
+        failed.set()
+    finally:
+        queues[0].put(_DONE)
+        if job is not None:
+            job.finish_stage(source_name, status="failed" if errors else "completed")
+
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
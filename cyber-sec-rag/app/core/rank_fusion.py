@@ -0,0 +1,18 @@
+from typing import Any, Dict, List
+
+
+def result_key(result: Dict[str, Any]):
+    return result["metadata"].get("file_name"), result["metadata"].get("chunk_id")
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict[str, Any]]], k: int = 60, limit: int = 5) -> List[Dict[str, Any]]:
+    # Score each chunk by sum(1 / (k + rank)) over every list it appears in
+    scores: Dict[Any, float] = {}
+    merged: Dict[Any, Dict[str, Any]] = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, 1):
+            key = result_key(result)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            merged[key] = {**result, **merged.get(key, {})}
+    ranked = sorted(scores, key=scores.get, reverse=True)[:limit]
+    return [{**merged[key], "rrf_score": scores[key]} for key in ranked]
@@ -0,0 +1,70 @@
+import asyncio
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from app.core.tracing import span
+
+_MISSING = object()
+
+
+class ServiceRegistry:
+    # Builds each service on first use. Factories import their heavy client
+    # libraries themselves, so importing the API only pays for what a request
+    # actually touches.
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._init_seconds: Dict[str, float] = {}
+        # Re-entrant: factories resolve their own dependencies through get()
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        self._factories[name] = factory
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name, _MISSING)
+        if instance is not _MISSING:
+            return instance
+        with self._lock:
+            instance = self._instances.get(name, _MISSING)
+            if instance is _MISSING:
+                started = time.perf_counter()
+                with span("service_init", service=name):
+                    instance = self._factories[name]()
+                self._init_seconds[name] = time.perf_counter() - started
+                self._instances[name] = instance
+            return instance
+
+    async def aget(self, name: str) -> Any:
+        # For async callers: a first-use build runs on a worker thread, so a
+        # slow client constructor does not stall every other request
+        instance = self._instances.get(name, _MISSING)
+        if instance is not _MISSING:
+            return instance
+        return await asyncio.to_thread(self.get, name)
+
+    def peek(self, name: str) -> Optional[Any]:
+        # The instance if it has been built, without building it
+        return self._instances.get(name)
+
+    def provide(self, name: str) -> Callable[[], Awaitable[Any]]:
+        # FastAPI dependency; built services are returned without a threadpool
+        # hop, a first-use build runs off the event loop
+        async def dependency() -> Any:
+            return await self.aget(name)
+        dependency.__name__ = f"get_{name}"
+        return dependency
+
+    def warm(self, names: Optional[Iterable[str]] = None):
+        for name in names or list(self._factories):
+            self.get(name)
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {
+                "initialized": name in self._instances,
+                "init_seconds": round(self._init_seconds[name], 3) if name in self._init_seconds else None
+            }
+            for name in self._factories
+        }
@@ -0,0 +1,221 @@
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.core.rank_fusion import result_key
+from app.core.tracing import SESSION_RETRIEVALS, span
+from app.core.vectors import normalize
+
+
+def session_scope(file_names: Optional[List[str]] = None) -> str:
+    # Cached candidates are only reused for questions over the same documents
+    return ",".join(sorted(file_names or []))
+
+
+class ConversationSession:
+    # One chat: its recent turns, plus every chunk retrieved for it so far and
+    # their embeddings, so follow-ups can be ranked without another search
+    def __init__(self, session_id: str, scope: str = ""):
+        self.session_id = session_id
+        self.scope = scope
+        self.turns: List[Dict[str, str]] = []
+        self.query_embedding: Optional[np.ndarray] = None
+        self.candidates: List[Dict[str, Any]] = []
+        self.vectors: Optional[np.ndarray] = None
+        self.updated_at = time.monotonic()
+
+    def clear_candidates(self):
+        self.candidates = []
+        self.vectors = None
+
+    def search_embedding(self, query_embedding: List[float], history_weight: float = 0.5) -> List[float]:
+        # "what about mitigations?" on its own matches little; mixed with the
+        # previous search it stays on the conversation's topic
+        query = normalize(np.asarray([query_embedding], dtype=np.float32))[0]
+        if self.query_embedding is not None and history_weight > 0:
+            query = normalize((query + history_weight * self.query_embedding)[None, :])[0]
+        self.query_embedding = query
+        return query.tolist()
+
+    def search_text(self, query: str) -> str:
+        # Keyword search gets the previous question's terms for the same reason
+        if not self.turns:
+            return query
+        return f"{self.turns[-1]['query']} {query}"
+
+    def add_candidates(self, results: List[Dict[str, Any]], vectors: List[List[float]], max_candidates: int = 100):
+        # Newest results first; a chunk retrieved again replaces its older copy.
+        # Embeddings are kept in self.vectors only.
+        results = [{key: value for key, value in result.items() if key != "embedding"} for result in results]
+        keys = {result_key(result) for result in results}
+        kept = [i for i, candidate in enumerate(self.candidates) if result_key(candidate) not in keys]
+        new_vectors = normalize(np.asarray(vectors, dtype=np.float32))
+        if self.vectors is not None and kept:
+            new_vectors = np.concatenate([new_vectors, self.vectors[kept]])
+        self.candidates = (list(results) + [self.candidates[i] for i in kept])[:max_candidates]
+        self.vectors = new_vectors[:max_candidates]
+
+    def rank(self, query_embedding: List[float], num_chunks: int, min_similarity: float = 0.4) -> Optional[List[Dict[str, Any]]]:
+        # The best cached chunks for the question, or None when fewer than
+        # num_chunks of them are similar enough and a full search is needed
+        if self.vectors is None or len(self.candidates) < num_chunks:
+            return None
+        query = normalize(np.asarray([query_embedding], dtype=np.float32))[0]
+        similarities = self.vectors @ query
+        order = np.argsort(-similarities)[:num_chunks]
+        if similarities[order[-1]] < min_similarity:
+            return None
+        results = []
+        for i in order:
+            result = {key: value for key, value in self.candidates[i].items() if key != "rrf_score"}
+            result["similarity"] = float(similarities[i])
+            result["embedding"] = self.vectors[i]
+            results.append(result)
+        return results
+
+    def add_turn(self, query: str, answer: str, max_turns: int = 10):
+        self.turns.append({"query": query, "answer": answer})
+        del self.turns[:-max_turns]
+
+    def history(self, max_turns: int = 3, max_answer_chars: int = 1000) -> str:
+        lines = []
+        for turn in self.turns[-max_turns:]:
+            lines.append(f"User: {turn['query']}")
+            lines.append(f"Assistant: {turn['answer'][:max_answer_chars]}")
+        return "\n".join(lines)
+
+
+async def retrieve_with_session(
+    session: ConversationSession,
+    query: str,
+    query_embedding: List[float],
+    num_chunks: int,
+    search: Callable[[str, List[float], int], Awaitable[List[Dict[str, Any]]]],
+    embed_documents: Callable[[List[str]], Awaitable[List[List[float]]]],
+    candidates: int = 20,
+    max_candidates: int = 100,
+    min_similarity: float = 0.4,
+    history_weight: float = 0.5,
+) -> List[Dict[str, Any]]:
+    # Follow-ups are ranked against the session's cached chunks. A search
+    # (for a wider candidate set than the question needs) runs on the first
+    # turn, or when too few cached chunks are similar enough.
+    search_embedding = session.search_embedding(query_embedding, history_weight)
+    if session.turns:
+        with span("session_rank", candidates=len(session.candidates)):
+            results = session.rank(search_embedding, num_chunks, min_similarity)
+        if results is not None:
+            SESSION_RETRIEVALS.labels("session").inc()
+            return results
+    SESSION_RETRIEVALS.labels("search").inc()
+    results = await search(session.search_text(query), search_embedding, max(num_chunks, candidates))
+    if results:
+        # Dense hits come with their stored embeddings; only keyword-only
+        # hits are embedded, through the embedding cache
+        missing = [i for i, result in enumerate(results) if result.get("embedding") is None]
+        vectors = [result.get("embedding") for result in results]
+        if missing:
+            with span("embed_candidates", chunks=len(missing)):
+                embedded = await embed_documents([results[i]["text"] for i in missing])
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+        session.add_candidates(results, vectors, max_candidates)
+    return results[:num_chunks]
+
+
+class SessionStore(ABC):
+    # Where sessions live between requests. MemorySessionStore keeps them in
+    # this process; a shared backend (e.g. Redis) implements the same methods.
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[ConversationSession]:
+        ...
+
+    @abstractmethod
+    def save(self, session: ConversationSession):
+        ...
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        ...
+
+    @abstractmethod
+    def invalidate(self):
+        # The indexed documents changed; cached candidates may be stale
+        ...
+
+    def create(self) -> ConversationSession:
+        session = ConversationSession(uuid.uuid4().hex)
+        self.save(session)
+        return session
+
+    def open(self, session_id: str, scope: str = "") -> ConversationSession:
+        # Unknown or expired ids start a fresh conversation under the same id
+        session = self.get(session_id) or ConversationSession(session_id, scope)
+        if session.scope != scope:
+            session.scope = scope
+            session.clear_candidates()
+        return session
+
+
+class MemorySessionStore(SessionStore):
+    # Least recently used sessions are dropped when full; a session expires
+    # ttl_seconds after its last use
+    def __init__(self, max_sessions: int = 10000, ttl_seconds: float = 1800):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, session_id: str) -> Optional[ConversationSession]:
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is None:
+                self.misses += 1
+                return None
+            session.updated_at = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            self.hits += 1
+            return session
+
+    def save(self, session: ConversationSession):
+        session.updated_at = time.monotonic()
+        with self._lock:
+            self._sessions[session.session_id] = session
+            self._sessions.move_to_end(session.session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def invalidate(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.clear_candidates()
+
+    def _expire(self):
+        # Sessions are kept in order of last use, so expired ones are at the front
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.updated_at >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "sessions": len(self._sessions),
+        }
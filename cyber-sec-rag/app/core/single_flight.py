@@ -0,0 +1,116 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from app.core.tracing import COALESCED_REQUESTS
+
+T = TypeVar("T")
+
+
+def normalize_query(query: str) -> str:
+    # "What is  Log4Shell?" and "what is log4shell?" share one computation
+    return " ".join(query.lower().split())
+
+
+class _Broadcast:
+    # Pumps one async iterator and replays its items to every subscriber,
+    # including ones that join after it started
+    def __init__(self, source: AsyncIterator[Any]):
+        self.items: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator[Any]):
+        try:
+            async for item in source:
+                self.items.append(item)
+                self._notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        index = 0
+        while True:
+            if index < len(self.items):
+                yield self.items[index]
+                index += 1
+            elif self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            else:
+                await self._changed.wait()
+
+
+class SingleFlight:
+    # Concurrent callers with the same key share one in-flight computation on
+    # the server event loop. The shared work runs as its own task, so a client
+    # that disconnects does not cancel it for the others.
+    def __init__(self, kind: str):
+        self.kind = kind
+        self._calls: Dict[str, asyncio.Future] = {}
+        self._streams: Dict[str, _Broadcast] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        role = "follower"
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finished(self._calls, key, done))
+            role = "leader"
+        COALESCED_REQUESTS.labels(self.kind, role).inc()
+        return await asyncio.shield(task)
+
+    async def prepared_stream(
+        self,
+        key: str,
+        prepare: Callable[[], Awaitable[Any]],
+        factory: Callable[[Any], AsyncIterator[T]]
+    ) -> AsyncIterator[T]:
+        # prepare() and the stream built from its result are one unit: callers
+        # that arrive while either runs share both, so whatever prepare()
+        # acquires (e.g. an admission slot) is taken once and released by the
+        # stream. Errors from prepare() reach every caller before streaming.
+        broadcast = self._streams.get(key)
+        role = "follower"
+        if broadcast is None:
+            task = self._calls.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._prepare_broadcast(key, prepare, factory))
+                self._calls[key] = task
+                task.add_done_callback(lambda done: self._finished(self._calls, key, done))
+                role = "leader"
+            broadcast = await asyncio.shield(task)
+        COALESCED_REQUESTS.labels(self.kind, role).inc()
+        return broadcast.subscribe()
+
+    async def _prepare_broadcast(
+        self,
+        key: str,
+        prepare: Callable[[], Awaitable[Any]],
+        factory: Callable[[Any], AsyncIterator[T]]
+    ) -> _Broadcast:
+        prepared = await prepare()
+        broadcast = _Broadcast(factory(prepared))
+        # Registered before this call finishes, so there is no gap in which a
+        # new caller would prepare again
+        self._streams[key] = broadcast
+        broadcast.task.add_done_callback(lambda done: self._finished(self._streams, key, broadcast))
+        return broadcast
+
+    @staticmethod
+    def _finished(flights: Dict[str, Any], key: str, flight: Any):
+        if flights.get(key) is flight:
+            del flights[key]
+        # Nobody may be left to await a failed call; mark its error as seen
+        if isinstance(flight, asyncio.Future) and not flight.cancelled():
+            flight.exception()
@@ -0,0 +1,6 @@
+import json
+from typing import Any, Dict
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    # One Server-Sent Events frame; data is JSON so newlines in tokens are safe
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
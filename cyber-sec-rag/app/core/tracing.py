@@ -0,0 +1,181 @@
+import asyncio
+import contextvars
+import json
+import logging
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Optional, Tuple
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.exposition import choose_encoder
+
+logger = logging.getLogger("rag.trace")
+
+REQUEST_ID_HEADER = "x-request-id"
+_REQUEST_ID_REGEX = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+# OCR and generation take seconds to minutes, cache hits and BM25 take milliseconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_duration_seconds",
+    "Latency of one ingestion or question-answering stage",
+    ["stage", "status"],
+    buckets=BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    "rag_request_duration_seconds",
+    "Latency of an HTTP request, including streamed bodies",
+    ["method", "route", "status_code"],
+    buckets=BUCKETS
+)
+
+# A follower joined an identical in-flight question or upload instead of
+# starting its own; leaders started one
+COALESCED_REQUESTS = Counter(
+    "rag_coalesced_requests_total",
+    "Requests that started (leader) or joined (follower) a shared in-flight computation",
+    ["kind", "role"]
+)
+
+QUERY_EMBED_BATCH_SIZE = Histogram(
+    "rag_query_embedding_batch_size",
+    "Query embedding requests sent upstream together in one micro-batch",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+
+SESSION_RETRIEVALS = Counter(
+    "rag_session_retrievals_total",
+    "Questions in a session answered from its cached chunks (session) or a new search (search)",
+    ["source"]
+)
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "rag_admission_queue_depth",
+    "Requests or jobs waiting for a slot, per admission pool",
+    ["pool"]
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "rag_admission_in_flight",
+    "Requests or jobs holding a slot, per admission pool",
+    ["pool"]
+)
+
+ADMISSION_WAIT_SECONDS = Histogram(
+    "rag_admission_wait_seconds",
+    "Time from arrival until a slot was granted, per admission pool",
+    ["pool"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+)
+
+ADMISSION_REJECTED = Counter(
+    "rag_admission_rejected_total",
+    "Requests answered with 429 because the pool's queue was full",
+    ["pool"]
+)
+
+STARTUP_SECONDS = Gauge(
+    "rag_startup_seconds",
+    "Time from importing the app module until it was ready to serve"
+)
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+@contextmanager
+def bind_request_id(request_id: Optional[str]):
+    # Worker threads do not inherit context variables; jobs re-bind the id of
+    # the request that queued them
+    token = _request_id.set(request_id)
+    try:
+        yield
+    finally:
+        _request_id.reset(token)
+
+
+def record(stage: str, seconds: float, status: str = "ok", **fields: Any):
+    request_id = _request_id.get()
+    exemplar = {"request_id": request_id} if request_id else None
+    STAGE_SECONDS.labels(stage, status).observe(seconds, exemplar)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(json.dumps({
+            "request_id": request_id,
+            "stage": stage,
+            "status": status,
+            "seconds": round(seconds, 6),
+            **fields
+        }, default=str))
+
+
+@contextmanager
+def span(stage: str, **fields: Any):
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except (GeneratorExit, asyncio.CancelledError):
+        # The client went away (e.g. closed a stream); the stage did not fail
+        status = "cancelled"
+        raise
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        record(stage, time.perf_counter() - started, status, **fields)
+
+
+def record_startup(seconds: float, budget_seconds: float):
+    STARTUP_SECONDS.set(seconds)
+    if seconds > budget_seconds:
+        logger.warning("Startup took %.2fs, over the %.2fs budget", seconds, budget_seconds)
+    else:
+        logger.info("Started in %.2fs", seconds)
+
+
+def render_metrics(accept_header: Optional[str]) -> Tuple[bytes, str]:
+    # OpenMetrics output (requested by Prometheus with exemplar storage
+    # enabled) carries the request id of a sample observation per bucket
+    encoder, content_type = choose_encoder(accept_header)
+    return encoder(REGISTRY), content_type
+
+
+class RequestTracingMiddleware:
+    # Plain ASGI middleware so streamed responses are timed to their last byte
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = dict(scope["headers"]).get(REQUEST_ID_HEADER.encode(), b"").decode("latin-1")
+        if not _REQUEST_ID_REGEX.match(request_id):
+            request_id = uuid.uuid4().hex
+        status_code = 500
+
+        async def send_with_request_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (REQUEST_ID_HEADER.encode(), request_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        started = time.perf_counter()
+        with bind_request_id(request_id):
+            try:
+                await self.app(scope, receive, send_with_request_id)
+            finally:
+                # Label by route template, not raw path, to keep cardinality bounded
+                route = getattr(scope.get("route"), "path", "unmatched")
+                REQUEST_SECONDS.labels(scope["method"], route, str(status_code)).observe(
+                    time.perf_counter() - started, {"request_id": request_id}
+                )
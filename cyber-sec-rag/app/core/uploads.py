@@ -0,0 +1,51 @@
+import hashlib
+import os
+import tempfile
+
+from fastapi import UploadFile
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, file_name: str, max_bytes: int):
+        super().__init__(f"{file_name} is larger than the {max_bytes} byte upload limit")
+        self.file_name = file_name
+        self.max_bytes = max_bytes
+
+
+class SpooledUpload:
+    # An uploaded file copied to disk; ingestion reads it from there and
+    # removes it when done, so no job holds the PDF bytes in memory
+    def __init__(self, path: str, file_name: str, size_bytes: int, content_hash: str):
+        self.path = path
+        self.file_name = file_name
+        self.size_bytes = size_bytes
+        self.content_hash = content_hash
+
+    def discard(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+async def spool_upload(file: UploadFile, directory: str, max_bytes: int, block_size: int = 1024 * 1024) -> SpooledUpload:
+    # Copies the upload in fixed-size blocks and hashes it on the way
+    os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=".pdf", dir=directory)
+    digest = hashlib.sha256()
+    size_bytes = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                block = await file.read(block_size)
+                if not block:
+                    break
+                size_bytes += len(block)
+                if size_bytes > max_bytes:
+                    raise UploadTooLarge(file.filename, max_bytes)
+                digest.update(block)
+                out.write(block)
+    except BaseException:
+        os.remove(path)
+        raise
+    return SpooledUpload(path, file.filename, size_bytes, digest.hexdigest())
@@ -0,0 +1,7 @@
+import numpy as np
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    # Scale rows to unit length so dot products are cosine similarities
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
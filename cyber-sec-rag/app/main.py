@@ -1,16 +1,39 @@
-from fastapi import FastAPI
+import time
+_import_started = time.perf_counter()
+
+import logging
+import threading
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import router
+from app.api.dependencies import close_services, services
+from app.api.routes import question_router, router
 from app.core.config.settings import get_settings
+from app.core.context_builder import get_encoding
+from app.core.tracing import RequestTracingMiddleware, record_startup, render_metrics
 
 # Initialize settings
 settings = get_settings()
+logging.basicConfig(level=settings.LOG_LEVEL)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    record_startup(time.perf_counter() - _import_started, settings.STARTUP_BUDGET_SECONDS)
+    # Loads the tokenizer for context packing in the background, so the
+    # first question does not wait for its download
+    get_encoding()
+    if settings.WARM_SERVICES_ON_STARTUP:
+        # Build clients in the background; requests are served meanwhile
+        threading.Thread(target=services.warm, name="warm-services", daemon=True).start()
+    yield
+    await close_services()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="PDF Processing API",
     description="API for processing PDFs and answering questions based on their content",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -22,8 +45,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request ids and per-request latency histograms
+app.add_middleware(RequestTracingMiddleware)
+
 # Include routers
 app.include_router(router, prefix="/api/v1")
+app.include_router(question_router, prefix="/api/v1")
+
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    body, content_type = render_metrics(request.headers.get("accept"))
+    return Response(content=body, media_type=content_type)
 
 # Global error handling
 @app.exception_handler(Exception)
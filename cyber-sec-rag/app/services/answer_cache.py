@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.vectors import normalize
+from app.services.bm25_index import TOKEN_REGEX
+
+
+def exact_terms(query: str) -> List[str]:
+    # Identifiers and numbers (CVE-2021-44228, port 445, 2.14.1) barely move a
+    # question's embedding, so they have to match exactly instead
+    return sorted({token for token in TOKEN_REGEX.findall(query.lower()) if any(c.isdigit() for c in token)})
+
+
+def answer_scope(num_chunks: int, file_names: Optional[List[str]] = None, query: str = "") -> str:
+    # Answers are only reused for questions retrieved over the same scope and
+    # naming the same identifiers
+    return f"k={num_chunks};files={','.join(sorted(file_names or []))};terms={','.join(exact_terms(query))}"
+
+
+class AnswerCache:
+    # Serves stored answers for questions whose embedding is close enough to a
+    # previously answered one. Entries expire after ttl_seconds, the least
+    # recently used entry is dropped when full, and invalidate() clears
+    # everything when the indexed documents change. Callers read generation
+    # before retrieving and pass it to store(), so an answer built from
+    # chunks that were replaced meanwhile is never stored.
+    def __init__(self, similarity_threshold: float = 0.95, ttl_seconds: float = 3600, max_entries: int = 1000):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_ids: List[int] = []
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stale_writes = 0
+
+    def lookup(self, query_embedding: List[float], scope: str = "") -> Optional[Dict[str, Any]]:
+        query = normalize(np.asarray([query_embedding], dtype=np.float32))[0]
+        with self._lock:
+            self._expire()
+            matrix = self._index()
+            if matrix is not None:
+                similarities = matrix @ query
+                for i in np.argsort(-similarities):
+                    if similarities[i] < self.similarity_threshold:
+                        break
+                    entry_id = self._matrix_ids[i]
+                    entry = self._entries[entry_id]
+                    if entry["scope"] == scope and entry["generation"] == self.generation:
+                        self._entries.move_to_end(entry_id)
+                        self.hits += 1
+                        return {
+                            "answer": entry["answer"],
+                            "sources": entry["sources"],
+                            "similarity": float(similarities[i])
+                        }
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        query_embedding: List[float],
+        answer: str,
+        sources: List[Dict[str, Any]],
+        scope: str = "",
+        generation: Optional[int] = None
+    ):
+        vector = normalize(np.asarray([query_embedding], dtype=np.float32))[0]
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                # Documents changed while this answer was being generated
+                self.stale_writes += 1
+                return
+            self._entries[self._next_id] = {
+                "vector": vector,
+                "answer": answer,
+                "sources": sources,
+                "scope": scope,
+                "generation": self.generation,
+                "created_at": time.monotonic()
+            }
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+            self.generation += 1
+            self.invalidations += 1
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        expired = [entry_id for entry_id, entry in self._entries.items() if entry["created_at"] < cutoff]
+        for entry_id in expired:
+            del self._entries[entry_id]
+        if expired:
+            self._matrix = None
+
+    def _index(self) -> Optional[np.ndarray]:
+        # Stack cached query vectors into one matrix, rebuilt only after changes
+        if self._matrix is None and self._entries:
+            self._matrix_ids = list(self._entries.keys())
+            self._matrix = np.stack([self._entries[entry_id]["vector"] for entry_id in self._matrix_ids])
+        return self._matrix
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "invalidations": self.invalidations,
+            "stale_writes": self.stale_writes,
+        }
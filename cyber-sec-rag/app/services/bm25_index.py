@@ -0,0 +1,143 @@
+import json
+import math
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Keeps identifiers such as CVE-2021-44228, 10.0.0.1 or ms17-010 as single terms
+TOKEN_REGEX = re.compile(r"[a-z0-9]+(?:[._:/-][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in TOKEN_REGEX.findall(text.lower()):
+        tokens.append(token)
+        # Also index the parts of compound identifiers ("cve-2021-44228" -> "44228")
+        parts = re.split(r"[._:/-]", token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class BM25Index:
+    # Inverted index with array-backed postings (doc ids and term frequencies
+    # as contiguous uint32 arrays) and Okapi BM25 scoring. Chunks are appended
+    # to a JSONL file and the postings are rebuilt from it on startup.
+    def __init__(self, path: Optional[str] = None, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._docs: List[Dict[str, Any]] = []
+        self._doc_lengths = array("I")
+        self._postings: Dict[str, List[array]] = {}
+        self._files: Dict[str, array] = {}
+        self._deleted = np.zeros(0, dtype=np.uint32)
+        # Corpus statistics over live (not deleted) docs only, so scores do
+        # not drift as documents are re-ingested
+        self._live = 0
+        self._total_length = 0
+        self._df: Dict[str, int] = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    # Deletions are logged inline so replay keeps doc ids stable
+                    if "deleted" in record:
+                        self._remove(record["deleted"]["file_name"], record["deleted"]["chunk_ids"])
+                    else:
+                        self._index([record])
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, rows: List[Dict[str, Any]]):
+        docs = [{"text": row["text"], "metadata": row.get("metadata", {})} for row in rows]
+        with self._lock:
+            if self.path:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.writelines(json.dumps(doc) + "\n" for doc in docs)
+            self._index(docs)
+
+    def remove(self, file_name: str, chunk_ids: Optional[List[int]] = None):
+        with self._lock:
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"deleted": {"file_name": file_name, "chunk_ids": chunk_ids}}) + "\n")
+            self._remove(file_name, chunk_ids)
+
+    def _remove(self, file_name: str, chunk_ids: Optional[List[int]]):
+        ids = self._files.get(file_name)
+        if not ids:
+            return
+        wanted = None if chunk_ids is None else set(chunk_ids)
+        doomed = [i for i in ids if wanted is None or self._docs[i]["metadata"].get("chunk_id") in wanted]
+        if doomed:
+            doomed_set = set(doomed)
+            self._files[file_name] = array("I", [i for i in ids if i not in doomed_set])
+            self._deleted = np.union1d(self._deleted, np.array(doomed, dtype=np.uint32))
+            for i in doomed:
+                self._live -= 1
+                self._total_length -= self._doc_lengths[i]
+                for term in set(tokenize(self._docs[i]["text"])):
+                    self._df[term] -= 1
+
+    def _index(self, docs: List[Dict[str, Any]]):
+        for doc in docs:
+            doc_id = len(self._docs)
+            terms = Counter(tokenize(doc["text"]))
+            length = sum(terms.values())
+            self._docs.append(doc)
+            self._files.setdefault(doc["metadata"].get("file_name"), array("I")).append(doc_id)
+            self._doc_lengths.append(length)
+            self._live += 1
+            self._total_length += length
+            for term, tf in terms.items():
+                self._df[term] = self._df.get(term, 0) + 1
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = [array("I"), array("I")]
+                postings[0].append(doc_id)
+                postings[1].append(tf)
+
+    def search(self, query: str, top_k: int = 5, file_names: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        terms = set(tokenize(query))
+        with self._lock:
+            n = self._live
+            if n == 0 or not terms:
+                return []
+            lengths = np.frombuffer(self._doc_lengths, dtype=np.uint32).astype(np.float32)
+            norm = self.k1 * (1 - self.b + self.b * lengths / (self._total_length / n or 1.0))
+            scores = np.zeros(len(self._docs), dtype=np.float32)
+            for term in terms:
+                postings = self._postings.get(term)
+                df = self._df.get(term, 0)
+                if postings is None or df == 0:
+                    continue
+                doc_ids = np.frombuffer(postings[0], dtype=np.uint32)
+                tf = np.frombuffer(postings[1], dtype=np.uint32).astype(np.float32)
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                scores[doc_ids] += idf * tf * (self.k1 + 1) / (tf + norm[doc_ids])
+            scores[self._deleted] = 0
+            if file_names:
+                partitions = [self._files[name] for name in file_names if name in self._files]
+                if not partitions:
+                    return []
+                allowed = np.concatenate([np.frombuffer(ids, dtype=np.uint32) for ids in partitions])
+                matched = allowed[scores[allowed] > 0]
+            else:
+                matched = np.flatnonzero(scores)
+            if len(matched) > top_k:
+                matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+            matched = matched[np.argsort(-scores[matched], kind="stable")]
+            return [{**self._docs[i], "bm25_score": float(scores[i])} for i in matched]
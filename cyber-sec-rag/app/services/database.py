@@ -1,23 +1,73 @@
-from supabase import create_client, Client
-from app.core.config.settings import get_settings
-from typing import List, Dict, Any
+from supabase import AsyncClientOptions, acreate_client
+from app.core.bulk_writer import BulkWriter
+from app.core.config.settings import Settings, get_settings
+from app.core.http_clients import ProviderClients
+from app.services.vector_store import LocalVectorStore, QuantizedVectorStore, SupabaseVectorStore, VectorStore
+from typing import List, Dict, Any, Optional
+
+def create_vector_store(settings: Settings, providers: ProviderClients) -> VectorStore:
+    if settings.VECTOR_STORE_BACKEND == "supabase":
+        # postgrest keeps its own keep-alive pool inside the async client
+        client = providers.run(acreate_client(
+            settings.SUPABASE_URL,
+            settings.SUPABASE_KEY,
+            options=AsyncClientOptions(postgrest_client_timeout=settings.HTTP_TIMEOUT_SECONDS)
+        ))
+        return SupabaseVectorStore(client, providers)
+    if settings.VECTOR_STORE_BACKEND == "local":
+        return LocalVectorStore(
+            settings.LOCAL_VECTOR_STORE_PATH,
+            dim=settings.EMBEDDING_DIM,
+            nlist=settings.IVF_NLIST,
+            nprobe=settings.IVF_NPROBE,
+            exact_search_limit=settings.EXACT_SEARCH_LIMIT
+        )
+    if settings.VECTOR_STORE_BACKEND == "quantized":
+        # Same files as "local" plus compact codes; only the codes stay in RAM
+        return QuantizedVectorStore(
+            settings.LOCAL_VECTOR_STORE_PATH,
+            dim=settings.EMBEDDING_DIM,
+            quantization=settings.QUANTIZATION,
+            rerank_factor=settings.QUANTIZED_RERANK_FACTOR,
+            min_rerank=settings.QUANTIZED_MIN_RERANK
+        )
+    raise ValueError(f"Unknown VECTOR_STORE_BACKEND: {settings.VECTOR_STORE_BACKEND}")
 
 class DatabaseService:
-    def __init__(self):
+    def __init__(self, providers: ProviderClients):
         settings = get_settings()
-        self.client: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+        self.store: VectorStore = create_vector_store(settings, providers)
+        self.writer = BulkWriter(
+            self.store.add,
+            batch_size=settings.STORE_BATCH_SIZE,
+            max_concurrency=settings.STORE_MAX_CONCURRENCY,
+            max_retries=settings.STORE_MAX_RETRIES,
+            backoff_seconds=settings.STORE_RETRY_BACKOFF_SECONDS
+        )
     
     def store_documents(self, data: List[Dict[str, Any]]):
-        response = self.client.table("docs").insert(data).execute()
-        return response
+        # Returns a report with batch, retry and rows-per-second figures
+        return self.writer.write(data)
+    
+    def delete_documents(self, file_name: str, chunk_ids: Optional[List[int]] = None):
+        # Drops stale chunks of a re-uploaded document (all of them when chunk_ids is None)
+        return self.store.delete(file_name, chunk_ids)
+    
+    def chunk_ids(self, file_name: str) -> List[int]:
+        return self.store.chunk_ids(file_name)
+    
+    def query_documents(self, query_embedding: List[float], match_threshold: float = 0.3, match_count: int = 5, file_names: Optional[List[str]] = None):
+        return self.store.query(
+            query_embedding=query_embedding,
+            match_threshold=match_threshold,
+            match_count=match_count,
+            file_names=file_names
+        )
     
-    def query_documents(self, query_embedding: List[float], match_threshold: float = 0.3, match_count: int = 5):
-        response = self.client.rpc(
-            "match_docs",
-            {
-                "query_embedding": query_embedding,
-                "match_threshold": match_threshold,
-                "match_count": match_count
-            }
-        ).execute()
-        return response.data 
\ No newline at end of file
+    async def aquery_documents(self, query_embedding: List[float], match_threshold: float = 0.3, match_count: int = 5, file_names: Optional[List[str]] = None):
+        return await self.store.aquery(
+            query_embedding=query_embedding,
+            match_threshold=match_threshold,
+            match_count=match_count,
+            file_names=file_names
+        )
@@ -0,0 +1,191 @@
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional
+
+from app.core.jobs import Job
+from app.core.page_manifest import PageManifest
+from app.core.pipeline import run_pipeline
+from app.core.tracing import span
+from app.core.uploads import SpooledUpload
+
+if TYPE_CHECKING:
+    # Only for annotations; the chunker module pulls in langchain
+    from app.services.semantic_chunker import SinglePassSemanticChunker
+
+
+class IngestionPipeline:
+    # Streams OCR pages through chunk -> embed -> store so that embedding page N
+    # overlaps with chunking page N+1 and storing page N-1
+    def __init__(
+        self,
+        extract_pages: Callable[[SpooledUpload], Iterable[str]],
+        chunker: "SinglePassSemanticChunker",
+        store_rows: Callable[[List[Dict[str, Any]]], Dict[str, Any]],
+        buffer_size: int = 2,
+        on_documents_changed: Optional[Callable[[], None]] = None,
+        index_rows: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+        manifest: Optional[PageManifest] = None,
+        delete_rows: Optional[Callable[[str, Optional[List[int]]], None]] = None,
+        yield_to_queries: Optional[Callable[[], None]] = None,
+        stored_chunk_ids: Optional[Callable[[str], List[int]]] = None,
+    ):
+        self.extract_pages = extract_pages
+        self.chunker = chunker
+        self.store_rows = store_rows
+        self.buffer_size = buffer_size
+        self.on_documents_changed = on_documents_changed
+        self.index_rows = index_rows
+        # With a manifest, re-uploads only re-process changed pages; delete_rows
+        # removes a document's chunks by id, and stored_chunk_ids lists the
+        # ones stored before the manifest knew the document
+        self.manifest = manifest
+        self.delete_rows = delete_rows
+        self.stored_chunk_ids = stored_chunk_ids
+        # Blocks briefly while questions are queued; embedding is the step
+        # that shares the OpenAI quota with them
+        self.yield_to_queries = yield_to_queries
+        # Reference-counted lock per file name
+        self._file_locks: Dict[str, List[Any]] = {}
+        self._file_locks_lock = threading.Lock()
+
+    @contextmanager
+    def _file_lock(self, file_name: str):
+        # Two revisions of a file ingested at once would read the same manifest
+        # and delete each other's rows, so jobs for one file run one at a time
+        with self._file_locks_lock:
+            entry = self._file_locks.setdefault(file_name, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._file_locks_lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._file_locks[file_name]
+
+    def run(self, job: Job, upload: SpooledUpload) -> Dict[str, Any]:
+        with self._file_lock(upload.file_name):
+            return self._run(job, upload)
+
+    def _run(self, job: Job, upload: SpooledUpload) -> Dict[str, Any]:
+        file_name = upload.file_name
+        incremental = self.manifest is not None and self.delete_rows is not None and self.stored_chunk_ids is not None
+        previous = {}
+        legacy: List[int] = []
+        next_chunk_id = 0
+        first_run = incremental and not self.manifest.contains(file_name)
+        if incremental:
+            if not first_run:
+                previous = self.manifest.pages(file_name)
+                next_chunk_id = self.manifest.next_chunk_id(file_name)
+            else:
+                # Rows stored before the manifest existed stay until their
+                # replacements are written; new ids start above theirs
+                legacy = self.stored_chunk_ids(file_name)
+                next_chunk_id = max(legacy) + 1 if legacy else 0
+        first_chunk_id = next_chunk_id
+        removed = []
+        pages = 0
+        unchanged = 0
+        deleted = 0
+        store_report = {"rows": 0, "batches": 0, "retries": 0, "seconds": 0.0}
+
+        def chunk(item):
+            page, markdown = item
+            page_hash = PageManifest.hash_page(markdown) if incremental else None
+            if page in previous and previous[page][0] == page_hash:
+                return page, page_hash, None
+            return page, page_hash, self.chunker.split_sentences(markdown)
+
+        def embed(item):
+            page, page_hash, sentences = item
+            if sentences is None:
+                return page, page_hash, None, None
+            if self.yield_to_queries is not None:
+                self.yield_to_queries()
+            chunks, sentence_vectors = self.chunker.chunk_sentences(sentences)
+            return page, page_hash, chunks, self.chunker.embed_chunks(chunks, sentence_vectors)
+
+        def store(item):
+            nonlocal next_chunk_id, pages, unchanged, deleted
+            page, page_hash, chunks, embeddings = item
+            pages += 1
+            if chunks is None:
+                unchanged += 1
+                return
+            rows = [
+                {
+                    "text": text,
+                    "embedding": embedding,
+                    "metadata": {
+                        "file_name": file_name,
+                        "page": page,
+                        "chunk_id": next_chunk_id + i
+                    }
+                }
+                for i, (text, embedding) in enumerate(zip(chunks, embeddings))
+            ]
+            next_chunk_id += len(rows)
+            if rows:
+                with span("store", rows=len(rows)):
+                    report = self.store_rows(rows)
+                for key in ("rows", "batches", "retries", "seconds"):
+                    store_report[key] += report[key]
+                if self.index_rows is not None:
+                    with span("keyword_index", rows=len(rows)):
+                        self.index_rows(rows)
+            if incremental:
+                # New rows are written before the old ones go, so the page is
+                # never missing from retrieval
+                stale = previous[page][1] if page in previous else []
+                if stale:
+                    with span("delete", rows=len(stale)):
+                        self.delete_rows(file_name, stale)
+                    deleted += len(stale)
+                self.manifest.put_page(file_name, page, page_hash, [row["metadata"]["chunk_id"] for row in rows], next_chunk_id)
+
+        try:
+            run_pipeline(
+                ("ocr", enumerate(self.extract_pages(upload))),
+                [("chunk", chunk), ("embed", embed), ("store", store)],
+                buffer_size=self.buffer_size,
+                job=job
+            )
+            # Pages past the end of a shorter revision
+            removed = sorted(page for page in previous if page >= pages)
+            if removed:
+                stale = [chunk_id for page in removed for chunk_id in previous[page][1]]
+                if stale:
+                    with span("delete", rows=len(stale)):
+                        self.delete_rows(file_name, stale)
+                    deleted += len(stale)
+                self.manifest.remove_pages(file_name, removed)
+            if legacy:
+                with span("delete", rows=len(legacy)):
+                    self.delete_rows(file_name, legacy)
+                deleted += len(legacy)
+        except BaseException:
+            if first_run:
+                # The next upload lists the stored rows again, including the
+                # ones this run wrote, and replaces them all
+                self.manifest.remove_document(file_name)
+            raise
+        finally:
+            # Rows may have been written even if a later page failed
+            if (store_report["rows"] or deleted) and self.on_documents_changed is not None:
+                self.on_documents_changed()
+
+        seconds = store_report["seconds"]
+        store_report["seconds"] = round(seconds, 3)
+        store_report["rows_per_second"] = round(store_report["rows"] / seconds, 1) if seconds > 0 else None
+        return {
+            "message": "PDF processed successfully",
+            "num_pages": pages,
+            "num_chunks": next_chunk_id - first_chunk_id,
+            "file_name": file_name,
+            "pages_unchanged": unchanged,
+            "pages_removed": len(removed),
+            "chunks_deleted": deleted,
+            "store": store_report
+        }
@@ -1,26 +1,76 @@
+import threading
+from typing import Iterator, List
 from mistralai import Mistral, DocumentURLChunk
 from app.core.config.settings import get_settings
+from app.core.http_clients import ProviderClients
+from app.core.ocr_cache import OCRCache
+from app.core.pdf_shards import ocr_in_shards
+from app.core.uploads import SpooledUpload
 
 class OCRService:
-    def __init__(self):
+    def __init__(self, providers: ProviderClients):
         settings = get_settings()
-        self.client = Mistral(api_key=settings.MISTRAL_API_KEY)
-    
-    async def process_pdf(self, file_content: bytes, file_name: str):
-        # Upload file to Mistral
-        uploaded_file = self.client.files.upload(
-            file={"file_name": file_name, "content": file_content},
-            purpose="ocr",
+        self.providers = providers
+        self.client = Mistral(
+            api_key=settings.MISTRAL_API_KEY,
+            async_client=providers.mistral_http,
+            timeout_ms=int(settings.OCR_TIMEOUT_SECONDS * 1000)
         )
+        self.cache = OCRCache(settings.OCR_CACHE_PATH, settings.OCR_CACHE_MAX_BYTES)
+        # Bounds concurrent Mistral OCR calls (shards included) across all ingestion workers
+        self.ocr_slots = threading.BoundedSemaphore(settings.MAX_PARALLEL_OCR)
+        self.shard_pages = settings.OCR_SHARD_PAGES
+        self.shard_window = settings.OCR_SHARD_CONCURRENCY
+        self.spool_dir = settings.UPLOAD_SPOOL_DIR
+    
+    def process_pdf_pages(self, upload: SpooledUpload) -> Iterator[str]:
+        # Identical bytes always OCR to the same pages, so skip Mistral on a repeat upload
+        cached_pages = self.cache.get(upload.content_hash)
+        if cached_pages is not None:
+            yield from cached_pages
+            return
+        
+        # Pages are yielded shard by shard, in order, and written to the cache as they arrive,
+        # unless another job is already writing the same bytes
+        writing = self.cache.begin(upload.content_hash)
+        page_count = 0
+        ocr_seconds = 0.0
+        try:
+            for pages, seconds in ocr_in_shards(
+                upload.path,
+                upload.file_name,
+                self.ocr_file,
+                self.providers,
+                self.ocr_slots,
+                pages_per_shard=self.shard_pages,
+                window=self.shard_window,
+                directory=self.spool_dir
+            ):
+                if writing:
+                    self.cache.add_pages(upload.content_hash, page_count, pages)
+                page_count += len(pages)
+                ocr_seconds += seconds
+                yield from pages
+        except BaseException:
+            if writing:
+                self.cache.abort(upload.content_hash)
+            raise
+        if writing:
+            self.cache.commit(upload.content_hash, ocr_seconds)
+    
+    async def ocr_file(self, path: str, file_name: str) -> List[str]:
+        # Upload file to Mistral; the file object is streamed, not read into memory
+        with open(path, "rb") as content:
+            uploaded_file = await self.client.files.upload_async(
+                file={"file_name": file_name, "content": content},
+                purpose="ocr",
+            )
         
         # Get signed URL and process OCR
-        signed_url = self.client.files.get_signed_url(file_id=uploaded_file.id, expiry=1)
-        pdf_response = self.client.ocr.process(
+        signed_url = await self.client.files.get_signed_url_async(file_id=uploaded_file.id, expiry=1)
+        pdf_response = await self.client.ocr.process_async(
             document=DocumentURLChunk(document_url=signed_url.url),
             model="mistral-ocr-latest",
             include_image_base64=False
         )
-        
-        # Extract text from PDF
-        markdown_text = "\n\n".join(page.markdown for page in pdf_response.pages)
-        return markdown_text 
\ No newline at end of file
+        return [page.markdown for page in pdf_response.pages]
@@ -1,19 +1,26 @@
+import time
 import google.generativeai as genai
 from app.core.config.settings import get_settings
-from typing import List, Dict
+from app.core.http_clients import ProviderClients
+from app.core.tracing import record, span
+from typing import AsyncIterator, List, Dict
 
 class QAService:
-    def __init__(self):
+    def __init__(self, providers: ProviderClients):
         settings = get_settings()
         genai.configure(api_key=settings.GOOGLE_API_KEY)
         self.model = genai.GenerativeModel('gemini-1.5-pro')
+        self.providers = providers
     
-    def generate_answer(self, query: str, context: str) -> str:
+    async def generate_answer(self, query: str, context: str, history: str = "") -> str:
+        return "".join([text async for text in self.stream_answer(query, context, history)])
+    
+    async def stream_answer(self, query: str, context: str, history: str = "") -> AsyncIterator[str]:
         prompt_template = """You are a cybersecurity expert assistant with deep technical knowledge. Your task is to provide comprehensive, detailed answers based on the context provided below.
 
         CONTEXT:
         {context}
-        
+        {history}
         QUESTION:
         {question}
         
@@ -28,20 +35,30 @@ class QAService:
         
         Provide a thorough, detailed response that fully addresses the question using all relevant information from the context:"""
         
-        full_prompt = prompt_template.format(context=context, question=query)
+        # Earlier turns of the conversation, so follow-ups can refer to them
+        history_section = f"\n        CONVERSATION SO FAR:\n{history}\n" if history else ""
+        full_prompt = prompt_template.format(context=context, history=history_section, question=query)
+        started = time.perf_counter()
         try:
-            response = self.model.generate_content(
-                full_prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0,
-                    top_p=0.95,
-                    max_output_tokens=2048,
-                    presence_penalty=0.1,
-                    frequency_penalty=0.1
-                ),
-                stream=True
-            )
-            response_text = "".join([part.text for part in response])
-            return response_text
+            with span("generate", prompt_chars=len(full_prompt)):
+                # The async gRPC channel is created on, and stays with, the provider loop
+                response = await self.providers.call(self.model.generate_content_async(
+                    full_prompt,
+                    generation_config=genai.types.GenerationConfig(
+                        temperature=0,
+                        top_p=0.95,
+                        max_output_tokens=2048,
+                        presence_penalty=0.1,
+                        frequency_penalty=0.1
+                    ),
+                    stream=True
+                ))
+                first_token = True
+                async for part in self.providers.iterate(response):
+                    if part.text:
+                        if first_token:
+                            record("first_token", time.perf_counter() - started)
+                            first_token = False
+                        yield part.text
         except Exception as e:
             raise RuntimeError(f"Error generating answer: {str(e)}") 
\ No newline at end of file
@@ -0,0 +1,102 @@
+import re
+from typing import List, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.core.tracing import span
+from app.core.vectors import normalize
+
+SENTENCE_SPLIT_REGEX = r"(?<=[.?!])\s+"
+
+
+class SinglePassSemanticChunker:
+    # Embeds every sentence of a document once, in large batches, and derives
+    # both the chunk boundaries and the chunk embeddings from those vectors
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        breakpoint_percentile: float = 95.0,
+        buffer_size: int = 1,
+        max_chunk_chars: int = 1000,
+        batch_size: int = 512,
+        reembed_chunks: bool = False,
+    ):
+        self.embeddings = embeddings
+        self.breakpoint_percentile = breakpoint_percentile
+        self.buffer_size = buffer_size
+        self.max_chunk_chars = max_chunk_chars
+        self.batch_size = batch_size
+        self.reembed_chunks = reembed_chunks
+
+    def split_sentences(self, text: str) -> List[str]:
+        sentences = []
+        with span("pre_split"):
+            for sentence in re.split(SENTENCE_SPLIT_REGEX, text):
+                sentence = sentence.strip()
+                # Tables and lists often have no sentence punctuation; hard-wrap them
+                while len(sentence) > self.max_chunk_chars:
+                    sentences.append(sentence[:self.max_chunk_chars])
+                    sentence = sentence[self.max_chunk_chars:].strip()
+                if sentence:
+                    sentences.append(sentence)
+        return sentences
+
+    def embed_sentences(self, sentences: List[str]) -> np.ndarray:
+        # Each sentence is embedded together with its neighbours, as SemanticChunker does
+        windows = [
+            " ".join(sentences[max(0, i - self.buffer_size):i + self.buffer_size + 1])
+            for i in range(len(sentences))
+        ]
+        vectors = []
+        with span("embed", texts=len(windows)):
+            for start in range(0, len(windows), self.batch_size):
+                vectors.extend(self.embeddings.embed_documents(windows[start:start + self.batch_size]))
+        return normalize(np.asarray(vectors, dtype=np.float32))
+
+    def split_text(self, text: str) -> Tuple[List[str], List[np.ndarray]]:
+        return self.chunk_sentences(self.split_sentences(text))
+
+    def chunk_sentences(self, sentences: List[str]) -> Tuple[List[str], List[np.ndarray]]:
+        if not sentences:
+            return [], []
+        vectors = self.embed_sentences(sentences)
+        with span("chunk", sentences=len(sentences)):
+            return self.group_sentences(sentences, vectors)
+
+    def group_sentences(self, sentences: List[str], vectors: np.ndarray) -> Tuple[List[str], List[np.ndarray]]:
+        # Cosine distance between consecutive sentence windows; break on the top percentile
+        distances = 1.0 - np.einsum("ij,ij->i", vectors[:-1], vectors[1:])
+        if len(distances):
+            breaks = distances > np.percentile(distances, self.breakpoint_percentile)
+        else:
+            breaks = np.zeros(0, dtype=bool)
+
+        lengths = np.fromiter((len(sentence) for sentence in sentences), dtype=np.int64, count=len(sentences))
+        chunks, chunk_vectors = [], []
+        start, size = 0, 0
+        for i in range(len(sentences)):
+            if i > start and size + 1 + lengths[i] > self.max_chunk_chars:
+                chunks.append(" ".join(sentences[start:i]))
+                chunk_vectors.append(vectors[start:i])
+                start, size = i, 0
+            size += lengths[i] + (1 if size else 0)
+            if i == len(sentences) - 1 or breaks[i]:
+                chunks.append(" ".join(sentences[start:i + 1]))
+                chunk_vectors.append(vectors[start:i + 1])
+                start, size = i + 1, 0
+        return chunks, chunk_vectors
+
+    def embed_chunks(self, chunks: List[str], sentence_vectors: List[np.ndarray]) -> List[List[float]]:
+        if self.reembed_chunks:
+            embeddings = []
+            with span("embed", texts=len(chunks)):
+                for start in range(0, len(chunks), self.batch_size):
+                    embeddings.extend(self.embeddings.embed_documents(chunks[start:start + self.batch_size]))
+            return embeddings
+        if not chunks:
+            return []
+        # Mean-pool the sentence vectors each chunk already has
+        pooled = np.stack([block.mean(axis=0) for block in sentence_vectors])
+        return normalize(pooled).tolist()
+
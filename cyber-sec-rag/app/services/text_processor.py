@@ -1,35 +1,50 @@
-from langchain_experimental.text_splitter import SemanticChunker
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
 from app.core.config.settings import get_settings
+from app.core.embedding_batcher import BatchedEmbeddings
+from app.core.embedding_cache import CachedEmbeddings, EmbeddingCache
+from app.core.http_clients import LoopBoundEmbeddings, ProviderClients
+from app.services.bm25_index import BM25Index
+from app.services.semantic_chunker import SinglePassSemanticChunker
 
 class TextProcessor:
-    def __init__(self):
+    def __init__(self, providers: ProviderClients):
         settings = get_settings()
-        self.embedding_model = OpenAIEmbeddings(
-            model="text-embedding-3-small",
-            openai_api_key=settings.OPENAI_API_KEY
+        self.embedding_cache = EmbeddingCache(
+            settings.EMBEDDING_CACHE_PATH,
+            memory_size=settings.EMBEDDING_CACHE_MEMORY_SIZE
         )
-        self.pre_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=100
+        # Cache misses go through the query micro-batcher, then the shared client
+        self.embedding_model = CachedEmbeddings(
+            BatchedEmbeddings(
+                LoopBoundEmbeddings(
+                    OpenAIEmbeddings(
+                        model=settings.EMBEDDING_MODEL,
+                        openai_api_key=settings.OPENAI_API_KEY,
+                        http_async_client=providers.openai_http
+                    ),
+                    providers
+                ),
+                providers,
+                window_seconds=settings.QUERY_EMBED_WINDOW_MS / 1000,
+                max_batch=settings.QUERY_EMBED_MAX_BATCH,
+                max_retries=settings.EMBED_RATE_LIMIT_RETRIES,
+                backoff_seconds=settings.EMBED_RATE_LIMIT_BACKOFF_SECONDS
+            ),
+            model=settings.EMBEDDING_MODEL,
+            cache=self.embedding_cache
         )
-        self.chunker = SemanticChunker(
+        self.chunker = SinglePassSemanticChunker(
             self.embedding_model,
-            breakpoint_threshold_type="percentile"
+            breakpoint_percentile=settings.CHUNK_BREAKPOINT_PERCENTILE,
+            max_chunk_chars=settings.CHUNK_MAX_CHARS,
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+            reembed_chunks=settings.CHUNK_REEMBED
         )
+        self.keyword_index = BM25Index(settings.BM25_INDEX_PATH)
     
-    def process_text(self, text: str):
-        # Pre-split text
-        pre_chunks = self.pre_splitter.split_text(text)
-        
-        # Process chunks
-        chunks = []
-        for pre_chunk in pre_chunks:
-            chunks.extend(self.chunker.split_text(pre_chunk))
-        
-        # Generate embeddings
-        texts = [chunk for chunk in chunks]
-        embeddings = self.embedding_model.embed_documents(texts)
-        
-        return chunks, embeddings 
\ No newline at end of file
+    def index_chunks(self, rows):
+        # Add stored chunks to the BM25 keyword index used for hybrid retrieval
+        self.keyword_index.add(rows)
+    
+    def unindex_chunks(self, file_name, chunk_ids=None):
+        self.keyword_index.remove(file_name, chunk_ids)
@@ -0,0 +1,521 @@
+import asyncio
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from array import array
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.vectors import normalize
+
+
+class VectorStore(ABC):
+    @abstractmethod
+    def add(self, rows: List[Dict[str, Any]]):
+        # An upsert on (file_name, chunk_id): BulkWriter retries a batch that
+        # may already have been written
+        ...
+
+    @abstractmethod
+    def query(
+        self,
+        query_embedding: List[float],
+        match_threshold: float = 0.3,
+        match_count: int = 5,
+        file_names: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        # file_names restricts the search to those documents before ranking
+        ...
+
+    @abstractmethod
+    def delete(self, file_name: str, chunk_ids: Optional[List[int]] = None):
+        # Removes the given chunks of a document, or all of them when chunk_ids is None
+        ...
+
+    @abstractmethod
+    def chunk_ids(self, file_name: str) -> List[int]:
+        # Chunk ids currently stored for a document
+        ...
+
+    async def aquery(
+        self,
+        query_embedding: List[float],
+        match_threshold: float = 0.3,
+        match_count: int = 5,
+        file_names: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        # Stores without a network client search off the event loop
+        return await asyncio.to_thread(self.query, query_embedding, match_threshold, match_count, file_names)
+
+
+class SupabaseVectorStore(VectorStore):
+    # Wraps a supabase AsyncClient that lives on the shared provider loop
+    def __init__(self, client, providers):
+        self.client = client
+        self.providers = providers
+
+    def add(self, rows: List[Dict[str, Any]]):
+        return self.providers.run(self._insert(rows))
+
+    def delete(self, file_name: str, chunk_ids: Optional[List[int]] = None):
+        return self.providers.run(self._delete(file_name, chunk_ids))
+
+    def chunk_ids(self, file_name: str) -> List[int]:
+        return self.providers.run(self._chunk_ids(file_name))
+
+    def query(
+        self,
+        query_embedding: List[float],
+        match_threshold: float = 0.3,
+        match_count: int = 5,
+        file_names: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        return self.providers.run(self._match(query_embedding, match_threshold, match_count, file_names))
+
+    async def aquery(
+        self,
+        query_embedding: List[float],
+        match_threshold: float = 0.3,
+        match_count: int = 5,
+        file_names: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        return await self.providers.call(self._match(query_embedding, match_threshold, match_count, file_names))
+
+    async def _insert(self, rows: List[Dict[str, Any]]):
+        # Needs the unique key from sql/docs_chunk_key.sql
+        return await self.client.table("docs").upsert(rows, on_conflict="file_name,chunk_id").execute()
+
+    async def _delete(self, file_name: str, chunk_ids: Optional[List[int]]):
+        request = self.client.table("docs").delete().eq("metadata->>file_name", file_name)
+        if chunk_ids is not None:
+            if not chunk_ids:
+                return None
+            # ->> yields text, so the ids are compared as strings
+            request = request.in_("metadata->>chunk_id", [str(chunk_id) for chunk_id in chunk_ids])
+        return await request.execute()
+
+    async def _chunk_ids(self, file_name: str, page_size: int = 1000) -> List[int]:
+        # Paged, since PostgREST caps the rows returned per request
+        chunk_ids = []
+        offset = 0
+        while True:
+            response = await (
+                self.client.table("docs")
+                .select("metadata->chunk_id")
+                .eq("metadata->>file_name", file_name)
+                .order("id")
+                .range(offset, offset + page_size - 1)
+                .execute()
+            )
+            chunk_ids.extend(int(row["chunk_id"]) for row in response.data if row.get("chunk_id") is not None)
+            if len(response.data) < page_size:
+                return chunk_ids
+            offset += page_size
+
+    async def _match(
+        self,
+        query_embedding: List[float],
+        match_threshold: float,
+        match_count: int,
+        file_names: Optional[List[str]],
+    ) -> List[Dict[str, Any]]:
+        params = {
+            "query_embedding": query_embedding,
+            "match_threshold": match_threshold,
+            "match_count": match_count
+        }
+        if file_names:
+            # Filtered RPC, see sql/match_docs_by_files.sql
+            response = await self.client.rpc("match_docs_by_files", {**params, "file_names": file_names}).execute()
+        else:
+            response = await self.client.rpc("match_docs", params).execute()
+        for row in response.data:
+            # PostgREST sends vector columns as text
+            if isinstance(row.get("embedding"), str):
+                row["embedding"] = json.loads(row["embedding"])
+        return response.data
+
+
+class LocalVectorStore(VectorStore):
+    # Embeddings live in a memory-mapped float32 matrix next to a JSONL file of
+    # texts and metadata. Small corpora are scanned exactly; larger ones go
+    # through an IVF index (k-means coarse quantizer + inverted lists).
+    def __init__(
+        self,
+        path: str,
+        dim: int = 1536,
+        nlist: int = 0,
+        nprobe: int = 8,
+        exact_search_limit: int = 4096,
+    ):
+        os.makedirs(path, exist_ok=True)
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.exact_search_limit = exact_search_limit
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._rows_path = os.path.join(path, "rows.jsonl")
+        self._deleted_path = os.path.join(path, "deleted.jsonl")
+        self._lock = threading.RLock()
+        self._rows: List[Dict[str, Any]] = []
+        # Deleted rows stay in the append-only files and are skipped at query time
+        deleted = set()
+        if os.path.exists(self._deleted_path):
+            with open(self._deleted_path, encoding="utf-8") as f:
+                deleted = {json.loads(line) for line in f if line.strip()}
+        self._deleted = np.array(sorted(deleted), dtype=np.int64)
+        # Row ids per file_name, for document-scoped queries
+        self._files: Dict[str, array] = {}
+        self._count = 0
+        if os.path.exists(self._rows_path):
+            with open(self._rows_path, "rb") as f:
+                offset = 0
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self._keep_record(record, offset)
+                        self._count += 1
+                        if record["id"] not in deleted:
+                            self._add_to_partition(record)
+                    offset += len(line)
+        self._capacity = 0
+        self._vectors: Optional[np.memmap] = None
+        self._open(max(self._count, 1024))
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[np.ndarray] = []
+        self._trained_count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _open(self, capacity: int):
+        # Grow the backing file and remap it; existing vectors are preserved
+        if capacity <= self._capacity:
+            return
+        if self._vectors is not None:
+            self._vectors.flush()
+            del self._vectors
+        mode = "r+" if os.path.exists(self._vectors_path) else "w+"
+        if mode == "r+":
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(capacity * self.dim * 4)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode=mode, shape=(capacity, self.dim))
+        self._capacity = capacity
+
+    def add(self, rows: List[Dict[str, Any]]):
+        if not rows:
+            return
+        vectors = normalize(np.asarray([row["embedding"] for row in rows], dtype=np.float32))
+        with self._lock:
+            # Rows with the same (file_name, chunk_id), e.g. from a retried
+            # batch, are replaced rather than duplicated
+            by_file: Dict[str, List[int]] = {}
+            for row in rows:
+                metadata = row.get("metadata", {})
+                if metadata.get("chunk_id") is not None:
+                    by_file.setdefault(metadata.get("file_name"), []).append(metadata["chunk_id"])
+            for file_name, chunk_ids in by_file.items():
+                self.delete(file_name, chunk_ids)
+            start = self._count
+            end = start + len(rows)
+            if end > self._capacity:
+                self._open(max(end, self._capacity * 2))
+            self._vectors[start:end] = vectors
+            self._vectors.flush()
+            records = [
+                {"id": start + i, "text": row["text"], "metadata": row.get("metadata", {})}
+                for i, row in enumerate(rows)
+            ]
+            with open(self._rows_path, "ab") as f:
+                for record in records:
+                    offset = f.tell()
+                    f.write((json.dumps(record) + "\n").encode("utf-8"))
+                    self._keep_record(record, offset)
+            for record in records:
+                self._add_to_partition(record)
+            self._count = end
+            if self._centroids is not None:
+                self._assign(np.arange(start, end), vectors)
+
+    def _keep_record(self, record: Dict[str, Any], offset: int):
+        # Rows are held in memory; offset is where the row starts in rows.jsonl
+        self._rows.append(record)
+
+    def _record(self, row_id: int) -> Dict[str, Any]:
+        return self._rows[row_id]
+
+    def _chunk_id(self, row_id: int) -> Optional[int]:
+        return self._rows[row_id]["metadata"].get("chunk_id")
+
+    def _add_to_partition(self, record: Dict[str, Any]):
+        file_name = record["metadata"].get("file_name")
+        self._files.setdefault(file_name, array("q")).append(record["id"])
+
+    def delete(self, file_name: str, chunk_ids: Optional[List[int]] = None):
+        with self._lock:
+            ids = self._files.get(file_name)
+            if not ids:
+                return
+            wanted = None if chunk_ids is None else set(chunk_ids)
+            doomed = [i for i in ids if wanted is None or self._chunk_id(i) in wanted]
+            if not doomed:
+                return
+            with open(self._deleted_path, "a", encoding="utf-8") as f:
+                f.writelines(f"{i}\n" for i in doomed)
+            doomed_set = set(doomed)
+            self._files[file_name] = array("q", [i for i in ids if i not in doomed_set])
+            self._deleted = np.union1d(self._deleted, np.array(doomed, dtype=np.int64))
+
+    def chunk_ids(self, file_name: str) -> List[int]:
+        with self._lock:
+            chunk_ids = [self._chunk_id(i) for i in self._files.get(file_name, [])]
+        return [chunk_id for chunk_id in chunk_ids if chunk_id is not None]
+
+    def query(
+        self,
+        query_embedding: List[float],
+        match_threshold: float = 0.3,
+        match_count: int = 5,
+        file_names: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        query = normalize(np.asarray([query_embedding], dtype=np.float32))[0]
+        with self._lock:
+            if self._count == 0:
+                return []
+            if file_names:
+                # Exact scan of the requested documents' partitions only
+                candidates = self._partition(file_names)
+            else:
+                candidates = self._candidates(query)
+            if candidates is None:
+                similarities = self._vectors[:self._count] @ query
+                ids = np.arange(self._count)
+            else:
+                similarities = self._vectors[candidates] @ query
+                ids = candidates
+            return self._top_matches(ids, similarities, match_threshold, match_count)
+
+    def _partition(self, file_names: List[str]) -> np.ndarray:
+        partitions = [self._files[name] for name in file_names if name in self._files]
+        if not partitions:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([np.frombuffer(ids, dtype=np.int64) for ids in partitions])
+
+    def _top_matches(self, ids: np.ndarray, similarities: np.ndarray, match_threshold: float, match_count: int) -> List[Dict[str, Any]]:
+        keep = similarities > match_threshold
+        if len(self._deleted):
+            keep &= ~np.isin(ids, self._deleted)
+        ids, similarities = ids[keep], similarities[keep]
+        if len(ids) > match_count:
+            top = np.argpartition(-similarities, match_count - 1)[:match_count]
+            ids, similarities = ids[top], similarities[top]
+        order = np.argsort(-similarities, kind="stable")
+        return [
+            {
+                **self._record(int(ids[i])),
+                "embedding": self._vectors[int(ids[i])].tolist(),
+                "similarity": float(similarities[i])
+            }
+            for i in order
+        ]
+
+    def _candidates(self, query: np.ndarray) -> Optional[np.ndarray]:
+        if self._count <= self.exact_search_limit:
+            return None
+        if self._centroids is None or self._count >= 2 * self._trained_count:
+            self._train()
+        probes = np.argsort(-(self._centroids @ query))[:self.nprobe]
+        return np.concatenate([self._lists[c] for c in probes])
+
+    def _train(self):
+        n = self._count
+        nlist = self.nlist or max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(0)
+        sample_ids = np.sort(rng.choice(n, size=min(n, nlist * 64), replace=False))
+        sample = np.asarray(self._vectors[sample_ids])
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(10):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=nlist)
+            filled = counts > 0
+            centroids[filled] = normalize(sums[filled])
+        self._centroids = centroids
+        self._lists = [np.zeros(0, dtype=np.int64) for _ in range(nlist)]
+        for start in range(0, n, 65536):
+            ids = np.arange(start, min(start + 65536, n))
+            self._assign(ids, np.asarray(self._vectors[ids]))
+        self._trained_count = n
+
+    def _assign(self, ids: np.ndarray, vectors: np.ndarray):
+        assignment = np.argmax(vectors @ self._centroids.T, axis=1)
+        for c in np.unique(assignment):
+            self._lists[c] = np.concatenate([self._lists[c], ids[assignment == c]])
+
+
+
+# Set bits per byte value, for Hamming distances over packed sign codes
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class QuantizedVectorStore(LocalVectorStore):
+    # Keeps only compact codes in RAM: int8 (1 byte per dimension plus a
+    # per-vector scale) or binary (1 bit per dimension). Queries scan the codes,
+    # then rerank a shortlist with the float32 vectors read from the memmap.
+    # Texts and metadata stay in rows.jsonl; only each row's file offset and
+    # chunk id are in RAM, and the top matches are read back from disk.
+    def __init__(
+        self,
+        path: str,
+        dim: int = 1536,
+        quantization: str = "int8",
+        rerank_factor: int = 10,
+        min_rerank: int = 100,
+        scan_block: int = 65536,
+    ):
+        if quantization not in ("int8", "binary"):
+            raise ValueError(f"Unknown quantization: {quantization}")
+        self.quantization = quantization
+        self.rerank_factor = rerank_factor
+        self.min_rerank = min_rerank
+        self.scan_block = scan_block
+        self._width = dim if quantization == "int8" else (dim + 7) // 8
+        self._codes_path = os.path.join(path, f"codes.{quantization}")
+        self._scales_path = os.path.join(path, "scales.f32")
+        self._codes = np.zeros((0, self._width), dtype=np.int8 if quantization == "int8" else np.uint8)
+        self._scales = np.zeros(0, dtype=np.float32)
+        self._offsets = array("q")
+        # -1 for rows without a chunk id
+        self._chunk_ids = array("q")
+        super().__init__(path, dim=dim)
+        self._load_codes()
+
+    def _load_codes(self):
+        stored = 0
+        if os.path.exists(self._codes_path):
+            stored = min(os.path.getsize(self._codes_path) // self._width, self._count)
+            if self.quantization == "int8":
+                stored = min(stored, os.path.getsize(self._scales_path) // 4 if os.path.exists(self._scales_path) else 0)
+        self._grow(max(self._count, 1024))
+        if stored:
+            self._codes[:stored] = np.fromfile(self._codes_path, dtype=self._codes.dtype, count=stored * self._width).reshape(stored, self._width)
+            if self.quantization == "int8":
+                self._scales[:stored] = np.fromfile(self._scales_path, dtype=np.float32, count=stored)
+        # Drop partial writes, then encode rows the code files do not cover yet
+        # (e.g. a store that was previously opened as "local")
+        with open(self._codes_path, "ab") as f:
+            f.truncate(stored * self._width)
+        if self.quantization == "int8":
+            with open(self._scales_path, "ab") as f:
+                f.truncate(stored * 4)
+        for start in range(stored, self._count, self.scan_block):
+            end = min(start + self.scan_block, self._count)
+            self._encode(start, end, np.asarray(self._vectors[start:end]))
+
+    def _keep_record(self, record: Dict[str, Any], offset: int):
+        self._offsets.append(offset)
+        chunk_id = record["metadata"].get("chunk_id")
+        self._chunk_ids.append(-1 if chunk_id is None else chunk_id)
+
+    def _record(self, row_id: int) -> Dict[str, Any]:
+        with open(self._rows_path, "rb") as f:
+            f.seek(self._offsets[row_id])
+            return json.loads(f.readline())
+
+    def _chunk_id(self, row_id: int) -> Optional[int]:
+        chunk_id = self._chunk_ids[row_id]
+        return None if chunk_id < 0 else chunk_id
+
+    def _grow(self, capacity: int):
+        if capacity <= len(self._codes):
+            return
+        codes = np.zeros((capacity, self._width), dtype=self._codes.dtype)
+        codes[:len(self._codes)] = self._codes
+        scales = np.zeros(capacity, dtype=np.float32)
+        scales[:len(self._scales)] = self._scales
+        self._codes, self._scales = codes, scales
+
+    def _quantize(self, vectors: np.ndarray):
+        if self.quantization == "binary":
+            return np.packbits(vectors > 0, axis=1), None
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def _encode(self, start: int, end: int, vectors: np.ndarray):
+        codes, scales = self._quantize(vectors)
+        if end > len(self._codes):
+            self._grow(max(end, len(self._codes) * 2))
+        self._codes[start:end] = codes
+        with open(self._codes_path, "ab") as f:
+            f.write(codes.tobytes())
+        if scales is not None:
+            self._scales[start:end] = scales
+            with open(self._scales_path, "ab") as f:
+                f.write(scales.tobytes())
+
+    def add(self, rows: List[Dict[str, Any]]):
+        if not rows:
+            return
+        with self._lock:
+            start = self._count
+            super().add(rows)
+            self._encode(start, self._count, np.asarray(self._vectors[start:self._count]))
+
+    def query(
+        self,
+        query_embedding: List[float],
+        match_threshold: float = 0.3,
+        match_count: int = 5,
+        file_names: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        query = normalize(np.asarray([query_embedding], dtype=np.float32))[0]
+        with self._lock:
+            if self._count == 0:
+                return []
+            ids = self._partition(file_names) if file_names else None
+            shortlist = self._shortlist(query, ids, max(match_count * self.rerank_factor, self.min_rerank))
+            # Rerank with full precision; sorted ids keep memmap reads sequential
+            shortlist = np.sort(shortlist)
+            similarities = np.asarray(self._vectors[shortlist]) @ query
+            return self._top_matches(shortlist, similarities, match_threshold, match_count)
+
+    def _live(self, ids: np.ndarray) -> np.ndarray:
+        if len(self._deleted):
+            return ids[~np.isin(ids, self._deleted)]
+        return ids
+
+    def _shortlist(self, query: np.ndarray, ids: Optional[np.ndarray], size: int) -> np.ndarray:
+        # Deleted rows are left out before scoring: upserts and re-ingestion
+        # leave near-identical deleted copies of live chunks, which would
+        # otherwise crowd the live ones out of the shortlist
+        total = self._count if ids is None else len(ids)
+        if total <= size:
+            return self._live(np.arange(self._count) if ids is None else ids)
+        if self.quantization == "binary":
+            query_code = np.packbits(query > 0)
+        best_ids = np.zeros(0, dtype=np.int64)
+        best_scores = np.zeros(0, dtype=np.float32)
+        # Scan in blocks so the float32 / popcount temporaries stay bounded
+        for start in range(0, total, self.scan_block):
+            block = np.arange(start, min(start + self.scan_block, total)) if ids is None else ids[start:start + self.scan_block]
+            if ids is None and not len(self._deleted):
+                codes = self._codes[start:start + len(block)]
+            else:
+                block = self._live(block)
+                codes = self._codes[block]
+            if self.quantization == "binary":
+                # Fewer differing sign bits means a smaller angle
+                scores = -_POPCOUNT[np.bitwise_xor(codes, query_code)].sum(axis=1, dtype=np.int32).astype(np.float32)
+            else:
+                scores = (codes.astype(np.float32) @ query) * self._scales[block]
+            best_ids = np.concatenate([best_ids, block])
+            best_scores = np.concatenate([best_scores, scores])
+            if len(best_ids) > size:
+                top = np.argpartition(-best_scores, size - 1)[:size]
+                best_ids, best_scores = best_ids[top], best_scores[top]
+        return best_ids
@@ -1,12 +1,15 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 from mistralai import Mistral, DocumentURLChunk
-from langchain_experimental.text_splitter import SemanticChunker
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings  # Keep for embeddings
 from supabase import create_client, Client
 import google.generativeai as genai
 from dotenv import load_dotenv
+from app.core.bulk_writer import BulkWriter
+from app.core.context_builder import build_context
+from app.core.embedding_cache import CachedEmbeddings, EmbeddingCache
+from app.services.semantic_chunker import SinglePassSemanticChunker
 
 # Load environment variables
 load_dotenv()
@@ -15,6 +18,7 @@ SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 MISTRAL_API_KEY = os.environ.get("MISTRAL_API_KEY")
 GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
+MAX_PARALLEL_OCR = int(os.environ.get("MAX_PARALLEL_OCR", 4))
 
 # Initialize clients
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
@@ -23,48 +27,60 @@ mistral_client = Mistral(api_key=MISTRAL_API_KEY)
 genai.configure(api_key=GOOGLE_API_KEY)
 gemini_model = genai.GenerativeModel('gemini-1.5-pro')  
 
-# Initialize OpenAI embedding model
-embedding_model = OpenAIEmbeddings(model="text-embedding-3-small", openai_api_key=OPENAI_API_KEY)
-
-# Semantic chunker with pre-splitter
-pre_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-chunker = SemanticChunker(embedding_model, breakpoint_threshold_type="percentile")
-
-# Rough token counter
-def count_tokens(text):
-    return len(text) // 4
-
-# Function to extract text from PDFs using Mistral OCR
+# Batched, concurrent, retrying writes into the docs table; upserts on
+# (file_name, chunk_id) (sql/docs_chunk_key.sql), so a retried batch is not stored twice
+bulk_writer = BulkWriter(lambda batch: supabase.table("docs").upsert(batch, on_conflict="file_name,chunk_id").execute())
+
+# Initialize OpenAI embedding model behind the shared embedding cache
+embedding_cache = EmbeddingCache(
+    os.environ.get("EMBEDDING_CACHE_PATH", ".cache/embedding_cache.sqlite3"),
+    memory_size=int(os.environ.get("EMBEDDING_CACHE_MEMORY_SIZE", 10000))
+)
+embedding_model = CachedEmbeddings(
+    OpenAIEmbeddings(model="text-embedding-3-small", openai_api_key=OPENAI_API_KEY),
+    model="text-embedding-3-small",
+    cache=embedding_cache
+)
+
+# Single-pass semantic chunker; chunk embeddings are pooled from its sentence embeddings
+chunker = SinglePassSemanticChunker(embedding_model, breakpoint_percentile=95.0, max_chunk_chars=1000)
+
+# OCR a single PDF with Mistral
+def ocr_pdf(file_name, file_content):
+    uploaded_file = mistral_client.files.upload(
+        file={"file_name": file_name, "content": file_content},
+        purpose="ocr",
+    )
+    signed_url = mistral_client.files.get_signed_url(file_id=uploaded_file.id, expiry=1)
+    pdf_response = mistral_client.ocr.process(
+        document=DocumentURLChunk(document_url=signed_url.url),
+        model="mistral-ocr-latest",
+        include_image_base64=False
+    )
+    return "\n\n".join(page.markdown for page in pdf_response.pages)
+
+# Function to extract text from PDFs using Mistral OCR, several files at a time
 def extract_text_from_pdfs(pdf_files):
+    files = [(pdf_file.name, pdf_file.read()) for pdf_file in pdf_files]
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_OCR) as pool:
+        texts = list(pool.map(lambda item: ocr_pdf(*item), files))
     all_text = []
-    for pdf_file in pdf_files:
-        uploaded_file = mistral_client.files.upload(
-            file={"file_name": pdf_file.name, "content": pdf_file.read()},
-            purpose="ocr",
-        )
-        signed_url = mistral_client.files.get_signed_url(file_id=uploaded_file.id, expiry=1)
-        pdf_response = mistral_client.ocr.process(
-            document=DocumentURLChunk(document_url=signed_url.url),
-            model="mistral-ocr-latest",
-            include_image_base64=False
-        )
-        markdown_text = "\n\n".join(page.markdown for page in pdf_response.pages)
-        all_text.append({"file_name": pdf_file.name, "content": markdown_text})
-        st.write(f"Extracted text from {pdf_file.name}: {markdown_text[:200]}...")
+    for (file_name, _), markdown_text in zip(files, texts):
+        all_text.append({"file_name": file_name, "content": markdown_text})
+        st.write(f"Extracted text from {file_name}: {markdown_text[:200]}...")
     return all_text
 
-# Function to chunk documents with pre-splitting
+# Function to chunk documents in one semantic pass, embedding each chunk from its sentences
 def chunk_documents(documents):
     chunks = []
     for doc in documents:
-        pre_chunks = pre_splitter.split_text(doc["content"])
-        doc_chunks = []
-        for pre_chunk in pre_chunks:
-            doc_chunks.extend(chunker.split_text(pre_chunk))
+        doc_chunks, sentence_vectors = chunker.split_text(doc["content"])
+        doc_embeddings = chunker.embed_chunks(doc_chunks, sentence_vectors)
         st.write(f"Created {len(doc_chunks)} chunks for {doc['file_name']}")
-        for i, chunk in enumerate(doc_chunks):
+        for i, (chunk, embedding) in enumerate(zip(doc_chunks, doc_embeddings)):
             chunks.append({
                 "text": chunk,
+                "embedding": embedding,
                 "metadata": {"file_name": doc["file_name"], "chunk_id": i}
             })
             st.write(f"Chunk {i}: {chunk[:100]}...")
@@ -72,10 +88,14 @@ def chunk_documents(documents):
 
 # Function to generate embeddings (using OpenAI)
 def generate_embeddings(chunks):
-    texts = [chunk["text"] for chunk in chunks]
+    # Chunks from chunk_documents already carry pooled embeddings
+    pending = [chunk for chunk in chunks if "embedding" not in chunk]
+    if not pending:
+        return chunks
+    texts = [chunk["text"] for chunk in pending]
     try:
         embeddings = embedding_model.embed_documents(texts)
-        for chunk, embedding in zip(chunks, embeddings):
+        for chunk, embedding in zip(pending, embeddings):
             chunk["embedding"] = embedding
         return chunks
     except Exception as e:
@@ -86,8 +106,8 @@ def generate_embeddings(chunks):
 def store_in_supabase(chunks):
     data = [{"text": chunk["text"], "embedding": chunk["embedding"], "metadata": chunk["metadata"]} for chunk in chunks]
     try:
-        response = supabase.table("docs").insert(data).execute()
-        st.write(f"Stored {len(response.data)} chunks in Supabase")
+        report = bulk_writer.write(data)
+        st.write(f"Stored {report['rows']} chunks in Supabase in {report['batches']} batches ({report['rows_per_second']} rows/s)")
     except Exception as e:
         st.error(f"Error storing in Supabase: {str(e)}")
 
@@ -174,22 +194,16 @@ def main():
                 results = query_supabase(query, top_k=num_chunks)
                 if results:
                     max_context_tokens = 15000  # Adjustable for Gemini’s larger context
-                    context = ""
-                    for result in results:
-                        chunk_text = f"Document: {result['metadata']['file_name']}, Chunk {result['metadata']['chunk_id']}:\n{result['text']}"
-                        if count_tokens(context + chunk_text) < max_context_tokens:
-                            context += chunk_text + "\n\n"
-                        else:
-                            st.warning(f"Stopped at {len(context.splitlines())//2} chunks to stay under token limit.")
-                            break
+                    context, used_results = build_context(results, max_tokens=max_context_tokens)
+                    if len(used_results) < len(results):
+                        st.warning(f"Packed {len(used_results)} of {len(results)} chunks to stay under token limit.")
                     with st.spinner("Generating answer..."):
                         answer = generate_answer(query, context)
                     st.subheader("Answer")
                     st.write(answer)
                     with st.expander("See source chunks"):
                         st.subheader("Source Chunks")
-                        used_chunks = len(context.splitlines())//2 if context else 0
-                        for i, result in enumerate(results[:used_chunks], 1):
+                        for i, result in enumerate(used_results, 1):
                             st.write(f"**Source {i} (Similarity: {result['similarity']:.3f})**")
                             st.write(f"From: {result['metadata']['file_name']}")
                             st.write(f"Text: {result['text']}")
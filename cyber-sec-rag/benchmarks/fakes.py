@@ -0,0 +1,204 @@
+import asyncio
+import hashlib
+import io
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from pypdf import PdfReader, PdfWriter
+
+from app.services.vector_store import VectorStore
+
+TOPICS = [
+    "ransomware", "phishing", "lateral movement", "privilege escalation", "SQL injection",
+    "cross-site scripting", "zero trust", "incident response", "threat hunting", "firewall rules",
+]
+TOOLS = ["nmap", "metasploit", "wireshark", "mimikatz", "burp suite", "splunk", "sysmon", "yara"]
+PORTS = [22, 53, 80, 135, 443, 445, 3389, 8080]
+
+
+class Recorder:
+    # Collects per-stage durations from every fake backend
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    @contextmanager
+    def timed(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+
+def synthetic_pdf(index: int, pages: int) -> bytes:
+    # Blank pages, so uploads can be split into shards; FakeMistral derives
+    # the page text from the bytes of each file it is sent
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(612, 792)
+    writer.add_metadata({"/Title": f"synthetic document {index}"})
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def synthetic_page(seed: str, page: int, sentences: int = 30) -> str:
+    rng = random.Random(f"{seed}:{page}")
+    lines = [f"# Section {page + 1}"]
+    for _ in range(sentences):
+        topic = rng.choice(TOPICS)
+        lines.append(
+            f"During {topic} investigations analysts used {rng.choice(TOOLS)} against port {rng.choice(PORTS)} "
+            f"and tracked CVE-{rng.randint(2015, 2024)}-{rng.randint(1000, 49999)}."
+        )
+    return " ".join(lines)
+
+
+def synthetic_questions(count: int, repeat_ratio: float = 0.3, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    questions: List[str] = []
+    for _ in range(count):
+        if questions and rng.random() < repeat_ratio:
+            questions.append(rng.choice(questions))
+        else:
+            questions.append(
+                f"How is {rng.choice(TOOLS)} used during {rng.choice(TOPICS)} on port {rng.choice(PORTS)}?"
+            )
+    return questions
+
+
+class FakeMistral:
+    # Mimics the async parts of the Mistral client used for OCR
+    def __init__(self, recorder: Recorder, latency: float = 1.0, per_page_latency: float = 0.0):
+        self.recorder = recorder
+        self.latency = latency
+        self.per_page_latency = per_page_latency
+        self._uploads: Dict[str, bytes] = {}
+        self.files = SimpleNamespace(upload_async=self._upload, get_signed_url_async=self._get_signed_url)
+        self.ocr = SimpleNamespace(process_async=self._process)
+
+    async def _upload(self, file: Dict[str, Any], purpose: str):
+        content = file["content"]
+        if hasattr(content, "read"):
+            content = content.read()
+        file_id = hashlib.sha256(content).hexdigest()
+        self._uploads[file_id] = content
+        return SimpleNamespace(id=file_id)
+
+    async def _get_signed_url(self, file_id: str, expiry: int):
+        return SimpleNamespace(url=f"fake://{file_id}")
+
+    async def _process(self, document, model: str, include_image_base64: bool):
+        content = self._uploads[document.document_url[len("fake://"):]]
+        pages = len(PdfReader(io.BytesIO(content)).pages)
+        with self.recorder.timed("ocr"):
+            await asyncio.sleep(self.latency + self.per_page_latency * pages)
+        seed = hashlib.sha256(content).hexdigest()
+        return SimpleNamespace(pages=[SimpleNamespace(markdown=synthetic_page(seed, page)) for page in range(pages)])
+
+
+class FakeEmbeddings:
+    # Feature-hashed bag of words: deterministic, similar texts get similar vectors
+    def __init__(self, recorder: Recorder, dim: int = 1536, latency: float = 0.1, per_text_latency: float = 0.0):
+        self.recorder = recorder
+        self.dim = dim
+        self.latency = latency
+        self.per_text_latency = per_text_latency
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in re.findall(r"[a-z0-9-]+", text.lower()):
+            digest = int(hashlib.md5(token.encode("utf-8")).hexdigest(), 16)
+            vector[digest % self.dim] += 1.0 if (digest >> 64) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self.recorder.timed("embed"):
+            await asyncio.sleep(self.latency + self.per_text_latency * len(texts))
+            return [self._vector(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        with self.recorder.timed("embed_query"):
+            await asyncio.sleep(self.latency)
+            return self._vector(text)
+
+
+class LatencyVectorStore(VectorStore):
+    # Wraps a real store and adds network-like latency to every call
+    def __init__(self, inner: VectorStore, recorder: Recorder, write_latency: float = 0.05, query_latency: float = 0.05):
+        self.inner = inner
+        self.recorder = recorder
+        self.write_latency = write_latency
+        self.query_latency = query_latency
+
+    def add(self, rows: List[Dict[str, Any]]):
+        with self.recorder.timed("store"):
+            time.sleep(self.write_latency)
+            return self.inner.add(rows)
+
+    def delete(self, file_name: str, chunk_ids: Optional[List[int]] = None):
+        with self.recorder.timed("delete"):
+            time.sleep(self.write_latency)
+            return self.inner.delete(file_name, chunk_ids)
+
+    def chunk_ids(self, file_name: str) -> List[int]:
+        time.sleep(self.query_latency)
+        return self.inner.chunk_ids(file_name)
+
+    def query(
+        self,
+        query_embedding: List[float],
+        match_threshold: float = 0.3,
+        match_count: int = 5,
+        file_names: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        with self.recorder.timed("retrieve"):
+            time.sleep(self.query_latency)
+            return self.inner.query(query_embedding, match_threshold, match_count, file_names)
+
+    async def aquery(
+        self,
+        query_embedding: List[float],
+        match_threshold: float = 0.3,
+        match_count: int = 5,
+        file_names: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        with self.recorder.timed("retrieve"):
+            await asyncio.sleep(self.query_latency)
+            return await self.inner.aquery(query_embedding, match_threshold, match_count, file_names)
+
+
+class FakeGemini:
+    # Streams a canned answer with a configurable time to first token
+    def __init__(self, recorder: Recorder, first_token_latency: float = 0.5, token_latency: float = 0.01, tokens: int = 200):
+        self.recorder = recorder
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.tokens = tokens
+
+    async def generate_content_async(self, prompt: str, generation_config=None, stream: bool = False):
+        async def parts():
+            started = time.perf_counter()
+            await asyncio.sleep(self.first_token_latency)
+            self.recorder.record("first_token", time.perf_counter() - started)
+            for i in range(self.tokens):
+                await asyncio.sleep(self.token_latency)
+                yield SimpleNamespace(text=f"token{i} ")
+            self.recorder.record("generate", time.perf_counter() - started)
+
+        if stream:
+            return parts()
+        return SimpleNamespace(text="".join([part.text async for part in parts()]))
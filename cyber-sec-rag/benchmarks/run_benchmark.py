@@ -0,0 +1,249 @@
+# Offline load test for the app API: Mistral, OpenAI, Supabase and Gemini are
+# replaced by local fakes with configurable latency, everything else (caches,
+# chunker, pipeline, retrieval, answer cache) runs for real. The real services
+# are built before their clients are swapped, so the SDKs from
+# requirements.txt must be installed; no network access or API keys are used.
+#
+#   cd cyber-sec-rag && python -m benchmarks.run_benchmark --docs 20 --questions 200
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import numpy as np
+
+from benchmarks.fakes import (
+    FakeEmbeddings,
+    FakeGemini,
+    FakeMistral,
+    LatencyVectorStore,
+    Recorder,
+    synthetic_pdf,
+    synthetic_questions,
+)
+
+INGEST_STAGES = ["upload", "ocr", "embed", "store", "job.ocr", "job.chunk", "job.embed", "job.store"]
+QUERY_STAGES = ["ask", "embed_query_batch", "retrieve", "first_token", "generate"]
+# Imported by the services the fakes are installed into
+PROVIDER_SDKS = ["mistralai", "google.generativeai", "langchain_openai", "supabase"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline latency/throughput benchmark for upload and ask")
+    parser.add_argument("--docs", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=8, help="pages per synthetic PDF")
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--repeat-ratio", type=float, default=0.3, help="share of repeated questions")
+    parser.add_argument("--upload-concurrency", type=int, default=4)
+    parser.add_argument("--ask-concurrency", type=int, default=8)
+    parser.add_argument("--num-chunks", type=int, default=5)
+    parser.add_argument("--stream", action="store_true", help="use /ask-question/stream")
+    parser.add_argument("--ocr-latency", type=float, default=0.5)
+    parser.add_argument("--ocr-page-latency", type=float, default=0.05)
+    parser.add_argument("--embed-latency", type=float, default=0.1)
+    parser.add_argument("--embed-text-latency", type=float, default=0.0005)
+    parser.add_argument("--store-latency", type=float, default=0.05)
+    parser.add_argument("--query-latency", type=float, default=0.03)
+    parser.add_argument("--llm-first-token", type=float, default=0.4)
+    parser.add_argument("--llm-token-latency", type=float, default=0.005)
+    parser.add_argument("--llm-tokens", type=int, default=100)
+    parser.add_argument("--embedding-dim", type=int, default=1536)
+    parser.add_argument("--backend", choices=["local", "quantized"], default="local", help="vector store behind the fake latency")
+    parser.add_argument("--workdir", help="cache/store directory (default: fresh temp dir)")
+    parser.add_argument("--json", help="also write the report to this file")
+    return parser.parse_args()
+
+
+def check_requirements():
+    missing = []
+    for module in PROVIDER_SDKS:
+        try:
+            found = importlib.util.find_spec(module) is not None
+        except ModuleNotFoundError:
+            found = False
+        if not found:
+            missing.append(module)
+    if missing:
+        sys.exit(
+            f"Missing provider SDKs: {', '.join(missing)}. The benchmark builds the real services "
+            "and then swaps their clients for fakes; install them with pip install -r requirements.txt"
+        )
+
+
+def configure_environment(args):
+    # Must run before the app is imported: settings are read at import time
+    workdir = args.workdir or tempfile.mkdtemp(prefix="rag-bench-")
+    for key in ("OPENAI_API_KEY", "MISTRAL_API_KEY", "GOOGLE_API_KEY"):
+        os.environ.setdefault(key, "offline")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ["VECTOR_STORE_BACKEND"] = args.backend
+    os.environ["EMBEDDING_DIM"] = str(args.embedding_dim)
+    os.environ["LOCAL_VECTOR_STORE_PATH"] = os.path.join(workdir, "vector_store")
+    os.environ["OCR_CACHE_PATH"] = os.path.join(workdir, "ocr_cache.sqlite3")
+    os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(workdir, "embedding_cache.sqlite3")
+    os.environ["UPLOAD_SPOOL_DIR"] = os.path.join(workdir, "uploads")
+    os.environ["PAGE_MANIFEST_PATH"] = os.path.join(workdir, "page_manifest.sqlite3")
+    os.environ["BM25_INDEX_PATH"] = os.path.join(workdir, "bm25_index.jsonl")
+    return workdir
+
+
+def install_fakes(services, recorder: Recorder, args):
+    # Builds the real services, then swaps only their provider clients
+    services.get("ocr").client = FakeMistral(recorder, args.ocr_latency, args.ocr_page_latency)
+    # Replaces OpenAIEmbeddings inside the batcher and provider-loop wrapper,
+    # so query batching and the shared async client path are exercised
+    services.get("text_processor").embedding_model.embeddings.embeddings.embeddings = FakeEmbeddings(
+        recorder, args.embedding_dim, args.embed_latency, args.embed_text_latency
+    )
+    db_service = services.get("db")
+    store = LatencyVectorStore(db_service.store, recorder, args.store_latency, args.query_latency)
+    db_service.store = store
+    db_service.writer.insert_batch = store.add
+    services.get("qa").model = FakeGemini(recorder, args.llm_first_token, args.llm_token_latency, args.llm_tokens)
+
+
+def upload(client, recorder: Recorder, index: int, pages: int) -> Dict[str, Any]:
+    file_name = f"synthetic-{index}.pdf"
+    started = time.perf_counter()
+    response = client.post(
+        "/api/v1/upload-pdf",
+        files={"file": (file_name, synthetic_pdf(index, pages), "application/pdf")}
+    )
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+    while True:
+        job = client.get(f"/api/v1/jobs/{job_id}").json()
+        if job["status"] in ("completed", "failed"):
+            break
+        time.sleep(0.01)
+    recorder.record("upload", time.perf_counter() - started)
+    for name, stage in job["stages"].items():
+        if stage["started_at"] and stage["finished_at"]:
+            recorder.record(f"job.{name}", stage["finished_at"] - stage["started_at"])
+    return job
+
+
+def ask(client, recorder: Recorder, query: str, num_chunks: int, stream: bool):
+    params = {"query": query, "num_chunks": num_chunks}
+    started = time.perf_counter()
+    if stream:
+        # TestClient buffers the body, so time to first token comes from FakeGemini
+        with client.stream("POST", "/api/v1/ask-question/stream", params=params) as response:
+            response.raise_for_status()
+            for _ in response.iter_lines():
+                pass
+    else:
+        client.post("/api/v1/ask-question", params=params).raise_for_status()
+    recorder.record("ask", time.perf_counter() - started)
+
+
+def summarize(samples: Dict[str, List[float]], stages: List[str], elapsed: float) -> Dict[str, Dict[str, float]]:
+    report = {}
+    for stage in stages:
+        values = samples.get(stage)
+        if not values:
+            continue
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        report[stage] = {
+            "count": len(values),
+            "p50_ms": p50 * 1000,
+            "p95_ms": p95 * 1000,
+            "p99_ms": p99 * 1000,
+            "mean_ms": float(np.mean(values)) * 1000,
+            "per_second": len(values) / elapsed if elapsed else 0.0,
+        }
+    return report
+
+
+def print_table(title: str, report: Dict[str, Dict[str, float]]):
+    print(f"\n{title}")
+    print(f"{'stage':<18}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mean ms':>10}{'ops/s':>9}")
+    for stage, row in report.items():
+        print(
+            f"{stage:<18}{row['count']:>7}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}"
+            f"{row['p99_ms']:>10.1f}{row['mean_ms']:>10.1f}{row['per_second']:>9.2f}"
+        )
+
+
+def main():
+    args = parse_args()
+    check_requirements()
+    workdir = configure_environment(args)
+
+    from fastapi.testclient import TestClient
+    from app.api.dependencies import services
+    from app.main import app
+
+    recorder = Recorder()
+    install_fakes(services, recorder, args)
+    # One portal (and event loop) for every request, as under uvicorn
+    with TestClient(app) as client:
+        run_phases(client, recorder, args, workdir)
+
+
+def run_phases(client, recorder: Recorder, args, workdir: str):
+    # Ingestion phase
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.upload_concurrency) as pool:
+        jobs = list(pool.map(lambda i: upload(client, recorder, i, args.pages), range(args.docs)))
+    ingest_elapsed = time.perf_counter() - started
+    failed = [job for job in jobs if job["status"] == "failed"]
+    ingest_samples = dict(recorder.samples)
+    recorder.samples.clear()
+
+    # Query phase
+    questions = synthetic_questions(args.questions, args.repeat_ratio)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.ask_concurrency) as pool:
+        list(pool.map(lambda q: ask(client, recorder, q, args.num_chunks, args.stream), questions))
+    query_elapsed = time.perf_counter() - started
+    # Query embeddings are batched, so they reach the fake as embed_documents
+    # calls; dedupe reuses the vectors the store returns and embeds nothing
+    recorder.samples["embed_query_batch"] = recorder.samples.pop("embed", [])
+
+    report = {
+        "workdir": workdir,
+        "ingest": {
+            "documents": args.docs,
+            "pages": args.docs * args.pages,
+            "failed": len(failed),
+            "seconds": ingest_elapsed,
+            "pages_per_second": args.docs * args.pages / ingest_elapsed if ingest_elapsed else 0.0,
+            "stages": summarize(ingest_samples, INGEST_STAGES, ingest_elapsed),
+        },
+        "query": {
+            "questions": args.questions,
+            "seconds": query_elapsed,
+            "questions_per_second": args.questions / query_elapsed if query_elapsed else 0.0,
+            "stages": summarize(recorder.samples, QUERY_STAGES, query_elapsed),
+        },
+        "caches": client.get("/api/v1/cache/stats").json(),
+    }
+
+    ingest = report["ingest"]
+    print_table(
+        f"Ingestion: {ingest['documents']} docs / {ingest['pages']} pages in {ingest['seconds']:.2f}s "
+        f"({ingest['pages_per_second']:.1f} pages/s, {ingest['failed']} failed)",
+        ingest["stages"]
+    )
+    query = report["query"]
+    print_table(
+        f"Questions: {query['questions']} in {query['seconds']:.2f}s ({query['questions_per_second']:.1f}/s)",
+        query["stages"]
+    )
+    print(f"\nCaches: {json.dumps(report['caches'])}")
+    for job in failed:
+        print(f"Failed {job['file_name']}: {job['error']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
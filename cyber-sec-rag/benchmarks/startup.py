@@ -0,0 +1,79 @@
+# Measures how long a fresh interpreter takes to import an API module and
+# fails when the median is over budget, so slow imports are caught before
+# they reach autoscaled workers.
+#
+#   cd cyber-sec-rag && python -m benchmarks.startup --module app.main --budget 2.0
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+PROBE = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Cold import time of the API process")
+    parser.add_argument("--module", default="app.main", help="app.main or main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=float(os.environ.get("STARTUP_BUDGET_SECONDS", 2.0)))
+    parser.add_argument("--importtime", action="store_true", help="show the slowest imports of one run")
+    return parser.parse_args()
+
+
+def environment():
+    env = dict(os.environ)
+    for key in ("OPENAI_API_KEY", "MISTRAL_API_KEY", "GOOGLE_API_KEY"):
+        env.setdefault(key, "offline")
+    env["LOG_LEVEL"] = "WARNING"
+    # Keep the run from touching the real caches
+    workdir = tempfile.mkdtemp(prefix="rag-startup-")
+    env["OCR_CACHE_PATH"] = os.path.join(workdir, "ocr_cache.sqlite3")
+    env["EMBEDDING_CACHE_PATH"] = os.path.join(workdir, "embedding_cache.sqlite3")
+    return env
+
+
+def slowest_imports(module: str, env, limit: int = 15):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)", line)
+        if match:
+            rows.append((int(match.group(2)), match.group(4)))
+    # Top-level packages only; nested entries are already in their parent's total
+    rows = [row for row in rows if "." not in row[1]]
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    args = parse_args()
+    env = environment()
+    samples = []
+    for _ in range(args.runs):
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=args.module)],
+            env=env, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            print(result.stderr)
+            sys.exit(result.returncode)
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+
+    median = float(np.median(samples))
+    print(f"{args.module}: median {median:.3f}s, max {max(samples):.3f}s over {args.runs} runs (budget {args.budget:.2f}s)")
+    if args.importtime:
+        for micros, name in slowest_imports(args.module, env):
+            print(f"  {micros / 1e6:8.3f}s  {name}")
+    if median > args.budget:
+        print("Over budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+-- Unique key for stored chunks, so chunk writes can be upserts. A batch that
+-- timed out but was committed is rewritten in place when it is retried,
+-- not inserted twice.
+
+alter table docs add column if not exists file_name text
+  generated always as (metadata->>'file_name') stored;
+alter table docs add column if not exists chunk_id integer
+  generated always as ((metadata->>'chunk_id')::integer) stored;
+
+-- Earlier versions inserted a document's chunks again on every re-upload,
+-- so one key can have several rows; keep only the newest of each
+delete from docs
+using docs newer
+where docs.file_name = newer.file_name
+  and docs.chunk_id = newer.chunk_id
+  and docs.id < newer.id;
+
+create unique index if not exists docs_file_name_chunk_id_key on docs (file_name, chunk_id);
@@ -0,0 +1,31 @@
+-- match_docs, returning each row's embedding, which the API uses to drop
+-- near-duplicate chunks without embedding their texts again.
+
+-- The return type changed, so an older version has to be dropped first
+drop function if exists match_docs (vector(1536), float, int);
+
+create or replace function match_docs (
+  query_embedding vector(1536),
+  match_threshold float,
+  match_count int
+)
+returns table (
+  id bigint,
+  text text,
+  metadata jsonb,
+  embedding vector(1536),
+  similarity float
+)
+language sql stable
+as $$
+  select
+    docs.id,
+    docs.text,
+    docs.metadata,
+    docs.embedding,
+    1 - (docs.embedding <=> query_embedding) as similarity
+  from docs
+  where 1 - (docs.embedding <=> query_embedding) > match_threshold
+  order by docs.embedding <=> query_embedding
+  limit match_count;
+$$;
@@ -0,0 +1,37 @@
+-- Document-scoped variant of match_docs used when /ask-question receives file_names.
+-- The file_name filter is applied before ranking, so the cost of a scoped
+-- question depends on the size of the selected documents, not the corpus.
+-- Rows include their embedding, which the API uses to drop near-duplicate chunks.
+
+create index if not exists docs_file_name_idx on docs ((metadata->>'file_name'));
+
+-- The return type changed, so an older version has to be dropped first
+drop function if exists match_docs_by_files (vector(1536), float, int, text[]);
+
+create or replace function match_docs_by_files (
+  query_embedding vector(1536),
+  match_threshold float,
+  match_count int,
+  file_names text[]
+)
+returns table (
+  id bigint,
+  text text,
+  metadata jsonb,
+  embedding vector(1536),
+  similarity float
+)
+language sql stable
+as $$
+  select
+    docs.id,
+    docs.text,
+    docs.metadata,
+    docs.embedding,
+    1 - (docs.embedding <=> query_embedding) as similarity
+  from docs
+  where docs.metadata->>'file_name' = any(file_names)
+    and 1 - (docs.embedding <=> query_embedding) > match_threshold
+  order by docs.embedding <=> query_embedding
+  limit match_count;
+$$;
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The app reads its settings from the environment on import; no provider is
+# called in these tests
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("MISTRAL_API_KEY", "test")
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.admission import AdmissionPool, Overloaded, estimate_retry_after
+
+
+def test_limits_concurrency_and_queue():
+    pool = AdmissionPool("test", max_concurrency=1, max_queue=1)
+
+    async def main():
+        release = await pool.acquire()
+        waiting = asyncio.ensure_future(pool.acquire())
+        await asyncio.sleep(0)
+        assert (pool.active, pool.queued) == (1, 1)
+        assert not pool.idle.is_set()
+        with pytest.raises(Overloaded) as rejected:
+            await pool.acquire()
+        assert rejected.value.pool == "test"
+        assert rejected.value.retry_after >= 1
+        # The slot passes straight to the queued caller
+        release()
+        second = await waiting
+        assert (pool.active, pool.queued) == (1, 0)
+        assert pool.idle.is_set()
+        second()
+
+    asyncio.run(main())
+    assert pool.active == 0
+    assert (pool.admitted, pool.rejected) == (2, 1)
+
+
+def test_release_is_idempotent():
+    pool = AdmissionPool("test", max_concurrency=2, max_queue=0)
+
+    async def main():
+        release = await pool.acquire()
+        other = await pool.acquire()
+        release()
+        release()
+        assert pool.active == 1
+        other()
+
+    asyncio.run(main())
+    assert pool.active == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    pool = AdmissionPool("test", max_concurrency=1, max_queue=4)
+
+    async def main():
+        release = await pool.acquire()
+        waiting = asyncio.ensure_future(pool.acquire())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.sleep(0)
+        assert pool.queued == 0
+        release()
+
+    asyncio.run(main())
+    assert pool.active == 0
+
+
+def test_slot_releases_on_error():
+    pool = AdmissionPool("test", max_concurrency=1, max_queue=0)
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            async with pool.slot():
+                raise RuntimeError("failed")
+
+    asyncio.run(main())
+    assert pool.active == 0
+
+
+def test_estimate_retry_after():
+    assert estimate_retry_after(0.1, 0, 16) == 1
+    assert estimate_retry_after(2.0, 9, 4) == 5
+
+
+@pytest.fixture
+def overloaded_client(monkeypatch):
+    # No question is admitted, so the request fails before any provider
+    # client is needed
+    from app.api import dependencies, routes
+    from app.main import app
+
+    monkeypatch.setattr(routes.query_pool, "max_concurrency", 0)
+    monkeypatch.setattr(routes.query_pool, "max_queue", 0)
+    for dependency in (
+        dependencies.get_text_processor,
+        dependencies.get_db_service,
+        dependencies.get_qa_service,
+        dependencies.get_answer_cache,
+        dependencies.get_session_store,
+    ):
+        app.dependency_overrides[dependency] = object
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.parametrize("path", ["/api/v1/ask-question", "/api/v1/ask-question/stream"])
+def test_overloaded_question_gets_429(overloaded_client, path):
+    response = overloaded_client.post(path, params={"query": "what is log4shell?"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
@@ -0,0 +1,58 @@
+from app.services.answer_cache import AnswerCache, answer_scope, exact_terms
+
+QUESTION = [1.0, 0.0, 0.0]
+PARAPHRASE = [0.99, 0.05, 0.0]
+SOURCES = [{"file_name": "a.pdf", "chunk_id": 0, "similarity": 0.9}]
+
+
+def test_exact_terms_keeps_identifiers():
+    assert exact_terms("Is CVE-2021-44228 exploitable on port 445?") == ["445", "cve-2021-44228"]
+    assert exact_terms("what is ransomware") == []
+
+
+def test_similar_question_in_same_scope_hits():
+    cache = AnswerCache(similarity_threshold=0.95)
+    scope = answer_scope(5, ["a.pdf"], "how does log4shell work")
+    cache.store(QUESTION, "answer", SOURCES, scope)
+    hit = cache.lookup(PARAPHRASE, scope)
+    assert hit["answer"] == "answer"
+    assert hit["sources"] == SOURCES
+
+
+def test_scope_separates_chunks_files_and_identifiers():
+    cache = AnswerCache(similarity_threshold=0.95)
+    cache.store(QUESTION, "answer", SOURCES, answer_scope(5, ["a.pdf"], "Is CVE-2021-44228 patched in 2.15?"))
+    # Same embedding, different retrieval scope or identifiers
+    assert cache.lookup(QUESTION, answer_scope(3, ["a.pdf"], "Is CVE-2021-44228 patched in 2.15?")) is None
+    assert cache.lookup(QUESTION, answer_scope(5, ["b.pdf"], "Is CVE-2021-44228 patched in 2.15?")) is None
+    assert cache.lookup(QUESTION, answer_scope(5, ["a.pdf"], "Is CVE-2021-45046 patched in 2.15?")) is None
+    assert cache.lookup(QUESTION, answer_scope(5, ["a.pdf"], "Is CVE-2021-44228 patched in 2.16?")) is None
+    # File order and wording around the identifiers do not matter
+    assert answer_scope(5, ["b.pdf", "a.pdf"]) == answer_scope(5, ["a.pdf", "b.pdf"])
+    assert cache.lookup(QUESTION, answer_scope(5, ["a.pdf"], "is cve-2021-44228 patched in 2.15")) is not None
+
+
+def test_invalidate_clears_entries():
+    cache = AnswerCache()
+    cache.store(QUESTION, "answer", SOURCES)
+    cache.invalidate()
+    assert cache.lookup(QUESTION) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_answer_generated_before_invalidation_is_not_stored():
+    cache = AnswerCache()
+    generation = cache.generation
+    # Documents change while the answer is being generated
+    cache.invalidate()
+    cache.store(QUESTION, "stale answer", SOURCES, generation=generation)
+    assert cache.lookup(QUESTION) is None
+    assert cache.stale_writes == 1
+    cache.store(QUESTION, "fresh answer", SOURCES, generation=cache.generation)
+    assert cache.lookup(QUESTION)["answer"] == "fresh answer"
+
+
+def test_expired_entries_miss():
+    cache = AnswerCache(ttl_seconds=0)
+    cache.store(QUESTION, "answer", SOURCES)
+    assert cache.lookup(QUESTION) is None
@@ -0,0 +1,74 @@
+from app.services.bm25_index import BM25Index, tokenize
+
+
+def row(file_name, chunk_id, text):
+    return {"text": text, "metadata": {"file_name": file_name, "chunk_id": chunk_id}}
+
+
+CORPUS = [
+    row("a.pdf", 0, "Log4Shell is tracked as CVE-2021-44228 and affects log4j 2.14.1."),
+    row("a.pdf", 1, "Patch to log4j 2.17.1 to mitigate remote code execution."),
+    row("b.pdf", 0, "EternalBlue (MS17-010) exploits SMB on port 445."),
+    row("b.pdf", 1, "Ransomware often spreads laterally over SMB."),
+]
+
+
+def keys(results):
+    return [(result["metadata"]["file_name"], result["metadata"]["chunk_id"]) for result in results]
+
+
+def scores(results):
+    return {key: round(result["bm25_score"], 5) for key, result in zip(keys(results), results)}
+
+
+def test_tokenize_keeps_identifiers_and_their_parts():
+    tokens = tokenize("See CVE-2021-44228 on 10.0.0.1")
+    assert "cve-2021-44228" in tokens and "44228" in tokens
+    assert "10.0.0.1" in tokens
+
+
+def test_exact_identifier_ranks_first():
+    index = BM25Index()
+    index.add(CORPUS)
+    assert keys(index.search("CVE-2021-44228", top_k=2))[0] == ("a.pdf", 0)
+    assert keys(index.search("ms17-010 smb", top_k=2))[0] == ("b.pdf", 0)
+    assert index.search("kerberoasting") == []
+
+
+def test_search_scoped_to_files():
+    index = BM25Index()
+    index.add(CORPUS)
+    assert set(keys(index.search("smb log4j", top_k=5, file_names=["b.pdf"]))) == {("b.pdf", 0), ("b.pdf", 1)}
+    assert index.search("smb", file_names=["missing.pdf"]) == []
+
+
+def test_removed_chunks_are_not_returned():
+    index = BM25Index()
+    index.add(CORPUS)
+    index.remove("a.pdf", [0])
+    assert ("a.pdf", 0) not in keys(index.search("log4j", top_k=5))
+    index.remove("b.pdf")
+    assert index.search("smb") == []
+
+
+def test_reingested_document_scores_like_a_fresh_index():
+    # Deleted chunks must not count in document frequencies or lengths
+    reingested = BM25Index()
+    reingested.add(CORPUS)
+    for _ in range(5):
+        reingested.remove("a.pdf")
+        reingested.add(CORPUS[:2])
+    fresh = BM25Index()
+    fresh.add(CORPUS)
+    for query in ("log4j patch", "smb ransomware"):
+        assert scores(reingested.search(query)) == scores(fresh.search(query))
+
+
+def test_reload_replays_additions_and_deletions(tmp_path):
+    path = str(tmp_path / "bm25.jsonl")
+    index = BM25Index(path)
+    index.add(CORPUS)
+    index.remove("a.pdf", [1])
+    reloaded = BM25Index(path)
+    assert len(reloaded) == len(index)
+    assert keys(reloaded.search("log4j", top_k=5)) == keys(index.search("log4j", top_k=5))
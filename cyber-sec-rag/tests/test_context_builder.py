@@ -0,0 +1,80 @@
+import pytest
+
+from app.core import context_builder
+from app.core.context_builder import build_context, drop_near_duplicates, merge_adjacent, strip_overlap
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    # Four characters per token, without loading tiktoken
+    monkeypatch.setattr(context_builder, "get_encoding", lambda: None)
+
+
+def chunk(chunk_id, text, file_name="a.pdf", similarity=0.5, embedding=None):
+    result = {"text": text, "metadata": {"file_name": file_name, "chunk_id": chunk_id}, "similarity": similarity}
+    if embedding is not None:
+        result["embedding"] = embedding
+    return result
+
+
+def ids(results):
+    return [result["metadata"]["chunk_id"] for result in results]
+
+
+def test_strip_overlap_removes_repeated_head():
+    previous = "Attackers gain initial access through phishing emails with malicious attachments."
+    text = "phishing emails with malicious attachments. Then they move laterally."
+    assert strip_overlap(previous, text) == "Then they move laterally."
+    assert strip_overlap(previous, "Unrelated text that shares nothing at all.") == "Unrelated text that shares nothing at all."
+
+
+def test_merge_adjacent_groups_consecutive_chunks_in_document_order():
+    spans = merge_adjacent([chunk(3, "c"), chunk(1, "a"), chunk(2, "b"), chunk(2, "x", file_name="b.pdf")])
+    assert [[(r["metadata"]["file_name"], r["metadata"]["chunk_id"]) for r in span] for span in spans] == [
+        [("a.pdf", 1), ("a.pdf", 2), ("a.pdf", 3)],
+        [("b.pdf", 2)],
+    ]
+
+
+def test_build_context_merges_spans_under_one_header():
+    context, used = build_context([chunk(2, "second part"), chunk(1, "first part")])
+    assert context == "Document: a.pdf, Chunks 1-2:\nfirst part second part"
+    assert ids(used) == [1, 2]
+
+
+def test_build_context_packs_by_relevance_and_emits_in_document_order():
+    results = [
+        chunk(10, "x" * 400, similarity=0.9),
+        chunk(20, "y" * 400, similarity=0.2),
+        chunk(30, "z" * 40, similarity=0.8),
+    ]
+    context, used = build_context(results, max_tokens=130)
+    assert ids(used) == [10, 30]
+    assert context.index("Chunk 10") < context.index("Chunk 30")
+
+
+def test_build_context_without_merge_keeps_chunks_apart():
+    context, used = build_context([chunk(1, "first"), chunk(2, "second")], merge=False)
+    assert context.count("Document:") == 2
+
+
+def test_near_duplicates_dropped_by_stored_embeddings():
+    results = [
+        chunk(0, "one", embedding=[1.0, 0.0, 0.0]),
+        chunk(1, "two", embedding=[1.0, 0.001, 0.0]),
+        chunk(2, "three", embedding=[0.6, 0.8, 0.0]),
+    ]
+    kept = drop_near_duplicates(results, [1.0, 0.0, 0.0], threshold=0.95)
+    assert ids(kept) == [0, 2]
+
+
+def test_keyword_only_hits_compared_by_shingle_overlap():
+    text = "lateral movement over smb with stolen credentials"
+    results = [
+        chunk(0, text, embedding=[1.0, 0.0]),
+        chunk(1, text),
+        chunk(2, "kerberoasting requests service tickets for offline cracking"),
+    ]
+    kept = drop_near_duplicates(results, [1.0, 0.0], threshold=0.95)
+    assert ids(kept) == [0, 2]
+
@@ -0,0 +1,78 @@
+import asyncio
+
+from langchain_core.embeddings import Embeddings
+
+from app.core.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        self.texts.append(text)
+        return [float(len(text)), 1.0]
+
+    async def aembed_documents(self, texts):
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text):
+        return self.embed_query(text)
+
+
+def cached(tmp_path, memory_size=100, model="model-a"):
+    upstream = CountingEmbeddings()
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"), memory_size=memory_size)
+    return CachedEmbeddings(upstream, model=model, cache=cache), upstream
+
+
+def test_only_misses_go_upstream_and_duplicates_once(tmp_path):
+    embeddings, upstream = cached(tmp_path)
+    assert embeddings.embed_documents(["a", "bb"]) == [[1.0, 1.0], [2.0, 1.0]]
+    assert embeddings.embed_documents(["bb", "ccc", "ccc", "a"]) == [[2.0, 1.0], [3.0, 1.0], [3.0, 1.0], [1.0, 1.0]]
+    assert upstream.texts == ["a", "bb", "ccc"]
+
+
+def test_queries_and_documents_share_the_cache(tmp_path):
+    embeddings, upstream = cached(tmp_path)
+    embeddings.embed_documents(["what is log4shell"])
+    assert embeddings.embed_query("what is log4shell") == [17.0, 1.0]
+    assert upstream.texts == ["what is log4shell"]
+
+
+def test_async_variants_use_the_cache(tmp_path):
+    embeddings, upstream = cached(tmp_path)
+
+    async def main():
+        first = await embeddings.aembed_documents(["a", "bb"])
+        second = await embeddings.aembed_documents(["bb"])
+        query = await embeddings.aembed_query("a")
+        return first, second, query
+
+    assert asyncio.run(main()) == ([[1.0, 1.0], [2.0, 1.0]], [[2.0, 1.0]], [1.0, 1.0])
+    assert upstream.texts == ["a", "bb"]
+
+
+def test_evicted_entries_are_read_back_from_disk(tmp_path):
+    embeddings, upstream = cached(tmp_path, memory_size=1)
+    embeddings.embed_documents(["a", "bb"])
+    assert embeddings.embed_documents(["a"]) == [[1.0, 1.0]]
+    stats = embeddings.cache.stats()
+    assert stats["disk_hits"] == 1
+    assert stats["memory_entries"] == 1
+    assert upstream.texts == ["a", "bb"]
+
+
+def test_cache_persists_and_is_keyed_by_model(tmp_path):
+    embeddings, _ = cached(tmp_path)
+    embeddings.embed_documents(["a"])
+    reopened, upstream = cached(tmp_path)
+    reopened.embed_documents(["a"])
+    assert upstream.texts == []
+    other_model, upstream = cached(tmp_path, model="model-b")
+    other_model.embed_documents(["a"])
+    assert upstream.texts == ["a"]
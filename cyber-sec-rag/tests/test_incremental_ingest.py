@@ -0,0 +1,158 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.page_manifest import PageManifest
+from app.services.ingestion import IngestionPipeline
+from app.services.vector_store import LocalVectorStore
+
+
+class FakeChunker:
+    # One chunk per page, embedded from its length; no provider is called
+    def __init__(self):
+        self.chunked: list = []
+
+    def split_sentences(self, markdown):
+        self.chunked.append(markdown)
+        return [markdown]
+
+    def chunk_sentences(self, sentences):
+        return sentences, None
+
+    def embed_chunks(self, chunks, sentence_vectors):
+        return [[1.0, float(len(chunk))] for chunk in chunks]
+
+
+def upload(file_name, pages):
+    return SimpleNamespace(file_name=file_name, pages=pages)
+
+
+def extract_pages(upload):
+    for page in upload.pages:
+        if page is None:
+            raise RuntimeError("OCR failed")
+        yield page
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LocalVectorStore(str(tmp_path / "store"), dim=2)
+
+
+@pytest.fixture
+def pipeline(tmp_path, store):
+    def store_rows(rows):
+        store.add(rows)
+        return {"rows": len(rows), "batches": 1, "retries": 0, "seconds": 0.0}
+
+    changes = []
+    pipeline = IngestionPipeline(
+        extract_pages,
+        FakeChunker(),
+        store_rows,
+        on_documents_changed=lambda: changes.append(True),
+        manifest=PageManifest(str(tmp_path / "manifest.sqlite3")),
+        delete_rows=store.delete,
+        stored_chunk_ids=store.chunk_ids,
+    )
+    pipeline.changes = changes
+    return pipeline
+
+
+def texts(store, file_name):
+    return sorted(store._record(i)["text"] for i in store._files.get(file_name, []) if i not in store._deleted)
+
+
+def test_unchanged_pages_are_skipped(pipeline, store):
+    first = pipeline.run(None, upload("a.pdf", ["page one", "page two"]))
+    assert first["num_chunks"] == 2
+    pipeline.chunker.chunked.clear()
+    pipeline.changes.clear()
+
+    second = pipeline.run(None, upload("a.pdf", ["page one", "page two"]))
+    assert second["pages_unchanged"] == 2
+    assert second["num_chunks"] == 0
+    assert pipeline.chunker.chunked == []
+    assert pipeline.changes == []
+    assert texts(store, "a.pdf") == ["page one", "page two"]
+
+
+def test_changed_page_replaces_only_its_chunks(pipeline, store):
+    pipeline.run(None, upload("a.pdf", ["page one", "page two"]))
+    pipeline.chunker.chunked.clear()
+
+    result = pipeline.run(None, upload("a.pdf", ["page one", "page two, revised"]))
+    assert result["pages_unchanged"] == 1
+    assert result["chunks_deleted"] == 1
+    assert pipeline.chunker.chunked == ["page two, revised"]
+    assert texts(store, "a.pdf") == ["page one", "page two, revised"]
+    assert pipeline.changes
+
+
+def test_shorter_revision_removes_trailing_pages(pipeline, store):
+    pipeline.run(None, upload("a.pdf", ["one", "two", "three"]))
+    result = pipeline.run(None, upload("a.pdf", ["one"]))
+    assert result["pages_removed"] == 2
+    assert texts(store, "a.pdf") == ["one"]
+    assert sorted(pipeline.manifest.pages("a.pdf")) == [0]
+
+
+def test_rows_stored_before_the_manifest_are_replaced_after_success(pipeline, store):
+    store.add([{"text": "legacy", "embedding": [1.0, 0.0], "metadata": {"file_name": "a.pdf", "chunk_id": 0}}])
+
+    result = pipeline.run(None, upload("a.pdf", ["page one"]))
+    assert result["chunks_deleted"] == 1
+    assert texts(store, "a.pdf") == ["page one"]
+    # New ids start above the legacy ones
+    assert store.chunk_ids("a.pdf") == [1]
+
+
+def test_failed_first_ingest_keeps_stored_rows(pipeline, store):
+    store.add([{"text": "legacy", "embedding": [1.0, 0.0], "metadata": {"file_name": "a.pdf", "chunk_id": 0}}])
+
+    with pytest.raises(RuntimeError):
+        pipeline.run(None, upload("a.pdf", ["page one", None]))
+    assert "legacy" in texts(store, "a.pdf")
+    assert not pipeline.manifest.contains("a.pdf")
+
+    # The next upload replaces the legacy rows and any the failed run wrote
+    pipeline.run(None, upload("a.pdf", ["page one", "page two"]))
+    assert texts(store, "a.pdf") == ["page one", "page two"]
+
+
+def test_other_documents_are_untouched(pipeline, store):
+    pipeline.run(None, upload("a.pdf", ["a"]))
+    pipeline.run(None, upload("b.pdf", ["b"]))
+    pipeline.run(None, upload("a.pdf", ["a, revised"]))
+    assert texts(store, "b.pdf") == ["b"]
+
+
+def test_jobs_for_the_same_file_run_one_at_a_time(pipeline):
+    running = 0
+    overlapped = False
+    lock = threading.Lock()
+
+    def slow_pages(upload):
+        nonlocal running, overlapped
+        with lock:
+            running += 1
+            overlapped = overlapped or running > 1
+        try:
+            threading.Event().wait(0.05)
+            yield from upload.pages
+        finally:
+            with lock:
+                running -= 1
+
+    pipeline.extract_pages = slow_pages
+    threads = [
+        threading.Thread(target=pipeline.run, args=(None, upload("a.pdf", [f"revision {i}"])))
+        for i in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not overlapped
+    assert pipeline._file_locks == {}
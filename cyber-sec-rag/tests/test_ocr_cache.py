@@ -0,0 +1,75 @@
+from app.core.ocr_cache import OCRCache
+
+
+def write(cache, content_hash, pages, ocr_seconds=1.0):
+    assert cache.begin(content_hash)
+    cache.add_pages(content_hash, 0, pages)
+    cache.commit(content_hash, ocr_seconds)
+
+
+def test_miss_then_hit(tmp_path):
+    cache = OCRCache(str(tmp_path / "ocr.sqlite3"), max_bytes=10_000)
+    assert cache.get("h") is None
+    write(cache, "h", ["page one", "page two"], ocr_seconds=2.5)
+    assert list(cache.get("h")) == ["page one", "page two"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["saved_ocr_seconds"] == 2.5
+
+
+def test_pages_stream_in_order_across_batches(tmp_path):
+    cache = OCRCache(str(tmp_path / "ocr.sqlite3"), max_bytes=1_000_000)
+    assert cache.begin("h")
+    pages = [f"page {i}" for i in range(150)]
+    for start in range(0, 150, 50):
+        cache.add_pages("h", start, pages[start:start + 50])
+    cache.commit("h", 1.0)
+    assert list(cache.get("h")) == pages
+
+
+def test_uncommitted_write_is_invisible_and_dropped_on_reopen(tmp_path):
+    path = str(tmp_path / "ocr.sqlite3")
+    cache = OCRCache(path, max_bytes=10_000)
+    assert cache.begin("h")
+    cache.add_pages("h", 0, ["partial"])
+    assert cache.get("h") is None
+    reopened = OCRCache(path, max_bytes=10_000)
+    assert reopened.get("h") is None
+    assert reopened.begin("h")
+
+
+def test_second_writer_for_the_same_hash_is_refused(tmp_path):
+    cache = OCRCache(str(tmp_path / "ocr.sqlite3"), max_bytes=10_000)
+    assert cache.begin("h")
+    cache.add_pages("h", 0, ["first job"])
+    # A concurrent job with the same bytes must not clear the first job's pages
+    assert not cache.begin("h")
+    cache.commit("h", 1.0)
+    assert list(cache.get("h")) == ["first job"]
+
+
+def test_abort_drops_pages_and_frees_the_hash(tmp_path):
+    cache = OCRCache(str(tmp_path / "ocr.sqlite3"), max_bytes=10_000)
+    assert cache.begin("h")
+    cache.add_pages("h", 0, ["partial"])
+    cache.abort("h")
+    assert cache.get("h") is None
+    write(cache, "h", ["retried"])
+    assert list(cache.get("h")) == ["retried"]
+
+
+def test_least_recently_used_documents_are_evicted(tmp_path):
+    cache = OCRCache(str(tmp_path / "ocr.sqlite3"), max_bytes=25)
+    write(cache, "a", ["x" * 10])
+    write(cache, "b", ["y" * 10])
+    assert cache.get("a") is not None
+    write(cache, "c", ["z" * 10])
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_document_larger_than_the_cache_is_not_stored(tmp_path):
+    cache = OCRCache(str(tmp_path / "ocr.sqlite3"), max_bytes=5)
+    write(cache, "h", ["too large to cache"])
+    assert cache.get("h") is None
+    assert cache.stats()["entries"] == 0
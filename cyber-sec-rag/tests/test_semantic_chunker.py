@@ -0,0 +1,69 @@
+from typing import List
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app.services.semantic_chunker import SinglePassSemanticChunker
+
+
+class TopicEmbeddings(Embeddings):
+    # Texts about phishing and about ransomware point in different directions
+    def __init__(self):
+        self.calls: List[List[str]] = []
+
+    def _vector(self, text):
+        text = text.lower()
+        return [text.count("phishing") + 0.1, text.count("ransomware") + 0.1, 0.1]
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+PHISHING = ["Phishing emails steal credentials.", "Phishing pages mimic login forms.", "Report phishing to the SOC."]
+RANSOMWARE = ["Ransomware encrypts files.", "Ransomware operators demand payment.", "Keep offline backups against ransomware."]
+
+
+def test_split_sentences_hard_wraps_long_runs():
+    chunker = SinglePassSemanticChunker(TopicEmbeddings(), max_chunk_chars=20)
+    sentences = chunker.split_sentences("Short one. " + "x" * 45)
+    assert sentences == ["Short one.", "x" * 20, "x" * 20, "x" * 5]
+
+
+def test_breaks_at_topic_change_with_one_embedding_pass():
+    embeddings = TopicEmbeddings()
+    chunker = SinglePassSemanticChunker(embeddings, breakpoint_percentile=50.0, buffer_size=0, batch_size=4)
+    chunks, sentence_vectors = chunker.split_text(" ".join(PHISHING + RANSOMWARE))
+    assert chunks == [" ".join(PHISHING), " ".join(RANSOMWARE)]
+    # Sentences are embedded once, in batches; chunks are not re-embedded
+    assert [len(call) for call in embeddings.calls] == [4, 2]
+    vectors = chunker.embed_chunks(chunks, sentence_vectors)
+    assert len(embeddings.calls) == 2
+    assert np.linalg.norm(vectors[0]) == pytest.approx(1.0)
+    assert vectors[0][0] > vectors[0][1] and vectors[1][1] > vectors[1][0]
+
+
+def test_chunks_respect_max_chunk_chars():
+    chunker = SinglePassSemanticChunker(TopicEmbeddings(), breakpoint_percentile=100.0, max_chunk_chars=80)
+    chunks, sentence_vectors = chunker.split_text(" ".join(PHISHING + RANSOMWARE))
+    assert all(len(chunk) <= 80 for chunk in chunks)
+    assert " ".join(chunks) == " ".join(PHISHING + RANSOMWARE)
+    assert [len(vectors) for vectors in sentence_vectors] == [len(chunker.split_sentences(chunk)) for chunk in chunks]
+
+
+def test_reembed_chunks_embeds_chunk_texts():
+    embeddings = TopicEmbeddings()
+    chunker = SinglePassSemanticChunker(embeddings, reembed_chunks=True)
+    chunks, sentence_vectors = chunker.split_text(" ".join(PHISHING))
+    chunker.embed_chunks(chunks, sentence_vectors)
+    assert embeddings.calls[-1] == chunks
+
+
+def test_empty_text():
+    chunker = SinglePassSemanticChunker(TopicEmbeddings())
+    assert chunker.split_text("   ") == ([], [])
+    assert chunker.embed_chunks([], []) == []
@@ -0,0 +1,160 @@
+import asyncio
+
+import pytest
+
+from app.core.admission import AdmissionPool
+from app.core.single_flight import SingleFlight, normalize_query
+
+
+def test_normalize_query():
+    assert normalize_query("What is  Log4Shell?") == normalize_query("what is log4shell?")
+
+
+def test_concurrent_callers_share_one_call():
+    flights = SingleFlight("test")
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def main():
+        return await asyncio.gather(*(flights.do("key", work) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["answer"] * 5
+    assert calls == 1
+
+
+def test_key_is_released_when_the_call_finishes():
+    flights = SingleFlight("test")
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    async def main():
+        first = await flights.do("key", work)
+        second = await flights.do("key", work)
+        return first, second
+
+    assert asyncio.run(main()) == (1, 2)
+    assert not flights._calls
+
+
+def test_error_reaches_every_caller_and_releases_the_key():
+    flights = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(flights.do("key", fail), flights.do("key", fail), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert not flights._calls
+
+
+def _streamed_request(flights, pool, key, delay, counter):
+    # Mirrors the streamed question: prepare() takes the query slot and the
+    # stream releases it once the answer is sent
+    async def prepare():
+        counter["prepares"] += 1
+        return await pool.acquire()
+
+    def event_stream(release):
+        async def events():
+            try:
+                for i in range(4):
+                    await asyncio.sleep(0.02)
+                    yield i
+            finally:
+                release()
+        return events()
+
+    async def request():
+        await asyncio.sleep(delay)
+        events = await flights.prepared_stream(key, prepare, event_stream)
+        return [event async for event in events]
+
+    return request()
+
+
+def test_prepared_stream_late_joiner_takes_no_slot():
+    flights = SingleFlight("test")
+    pool = AdmissionPool("test", max_concurrency=1, max_queue=0)
+    counter = {"prepares": 0}
+
+    async def main():
+        # The third request arrives after prepare() finished, while the
+        # answer is still streaming
+        results = await asyncio.gather(
+            _streamed_request(flights, pool, "key", 0, counter),
+            _streamed_request(flights, pool, "key", 0, counter),
+            _streamed_request(flights, pool, "key", 0.03, counter),
+        )
+        await asyncio.sleep(0)
+        return results
+
+    assert asyncio.run(main()) == [[0, 1, 2, 3]] * 3
+    assert counter["prepares"] == 1
+    assert pool.active == 0
+    assert not flights._calls and not flights._streams
+
+
+def test_prepared_stream_error_releases_nothing_and_reaches_callers():
+    flights = SingleFlight("test")
+
+    async def prepare():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("retrieval failed")
+
+    def event_stream(prepared):
+        raise AssertionError("not reached")
+
+    async def main():
+        return await asyncio.gather(
+            flights.prepared_stream("key", prepare, event_stream),
+            flights.prepared_stream("key", prepare, event_stream),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert not flights._calls and not flights._streams
+
+
+def test_different_keys_do_not_coalesce():
+    flights = SingleFlight("test")
+
+    async def main():
+        return await asyncio.gather(
+            flights.do("a", lambda: asyncio.sleep(0.01, result="a")),
+            flights.do("b", lambda: asyncio.sleep(0.01, result="b")),
+        )
+
+    assert asyncio.run(main()) == ["a", "b"]
+
+
+@pytest.mark.parametrize("delay", [0, 0.01])
+def test_cancelled_caller_does_not_cancel_shared_call(delay):
+    flights = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.03)
+        return "done"
+
+    async def main():
+        leader = asyncio.ensure_future(flights.do("key", work))
+        await asyncio.sleep(delay)
+        follower = asyncio.ensure_future(flights.do("key", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(main()) == "done"
@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+
+from app.services.vector_store import LocalVectorStore, QuantizedVectorStore
+
+DIM = 32
+
+BACKENDS = [
+    pytest.param(lambda path, **kwargs: LocalVectorStore(path, dim=DIM, **kwargs), id="local"),
+    pytest.param(lambda path, **kwargs: QuantizedVectorStore(path, dim=DIM, quantization="int8", **kwargs), id="int8"),
+    pytest.param(lambda path, **kwargs: QuantizedVectorStore(path, dim=DIM, quantization="binary", **kwargs), id="binary"),
+]
+
+
+def rows(file_name, vectors, first_chunk_id=0, prefix=None):
+    return [
+        {
+            "text": f"{prefix or file_name}:{first_chunk_id + i}",
+            "embedding": vector.tolist(),
+            "metadata": {"file_name": file_name, "chunk_id": first_chunk_id + i},
+        }
+        for i, vector in enumerate(vectors)
+    ]
+
+
+def top_texts(store, query, **kwargs):
+    return [result["text"] for result in store.query(query.tolist(), match_threshold=0.0, **kwargs)]
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).normal(size=(300, DIM)).astype(np.float32)
+
+
+@pytest.mark.parametrize("make_store", BACKENDS)
+def test_query_returns_nearest_chunk_with_its_embedding(tmp_path, make_store, vectors):
+    store = make_store(str(tmp_path))
+    store.add(rows("a.pdf", vectors[:50]))
+    results = store.query(vectors[7].tolist(), match_threshold=0.0, match_count=3)
+    assert results[0]["text"] == "a.pdf:7"
+    assert results[0]["metadata"] == {"file_name": "a.pdf", "chunk_id": 7}
+    assert results[0]["similarity"] == pytest.approx(1.0, abs=1e-5)
+    assert len(results[0]["embedding"]) == DIM
+
+
+@pytest.mark.parametrize("make_store", BACKENDS)
+def test_upsert_replaces_rows_with_the_same_key(tmp_path, make_store, vectors):
+    store = make_store(str(tmp_path))
+    store.add(rows("a.pdf", vectors[:5]))
+    store.add(rows("a.pdf", vectors[:5], prefix="retry"))
+    assert sorted(store.chunk_ids("a.pdf")) == [0, 1, 2, 3, 4]
+    assert top_texts(store, vectors[3], match_count=1) == ["retry:3"]
+
+
+@pytest.mark.parametrize("make_store", BACKENDS)
+def test_deleted_copies_do_not_crowd_out_live_rows(tmp_path, make_store, vectors):
+    # Repeated upserts leave many near-identical deleted rows behind
+    store = make_store(str(tmp_path))
+    for _ in range(30):
+        store.add(rows("a.pdf", vectors[:5]))
+    store.add(rows("b.pdf", vectors[100:300]))
+    assert top_texts(store, vectors[2], match_count=3)[0] == "a.pdf:2"
+    assert len(set(top_texts(store, vectors[2], match_count=10))) == 10
+
+
+@pytest.mark.parametrize("make_store", BACKENDS)
+def test_delete(tmp_path, make_store, vectors):
+    store = make_store(str(tmp_path))
+    store.add(rows("a.pdf", vectors[:5]))
+    store.add(rows("b.pdf", vectors[5:10]))
+    store.delete("a.pdf", [1, 2])
+    assert sorted(store.chunk_ids("a.pdf")) == [0, 3, 4]
+    assert "a.pdf:1" not in top_texts(store, vectors[1], match_count=10)
+    store.delete("a.pdf")
+    assert store.chunk_ids("a.pdf") == []
+    assert sorted(store.chunk_ids("b.pdf")) == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.parametrize("make_store", BACKENDS)
+def test_scoped_query_only_searches_selected_files(tmp_path, make_store, vectors):
+    store = make_store(str(tmp_path))
+    store.add(rows("a.pdf", vectors[:20]))
+    store.add(rows("b.pdf", vectors[20:40]))
+    results = top_texts(store, vectors[3], match_count=5, file_names=["b.pdf"])
+    assert results and all(text.startswith("b.pdf:") for text in results)
+    assert top_texts(store, vectors[3], file_names=["missing.pdf"]) == []
+
+
+@pytest.mark.parametrize("make_store", BACKENDS)
+def test_reopen_from_disk(tmp_path, make_store, vectors):
+    store = make_store(str(tmp_path))
+    store.add(rows("a.pdf", vectors[:10]))
+    store.delete("a.pdf", [4])
+    store.add(rows("a.pdf", vectors[10:12], first_chunk_id=10))
+
+    reopened = make_store(str(tmp_path))
+    assert len(reopened) == len(store)
+    assert sorted(reopened.chunk_ids("a.pdf")) == [0, 1, 2, 3, 5, 6, 7, 8, 9, 10, 11]
+    assert top_texts(reopened, vectors[11], match_count=1) == ["a.pdf:11"]
+    assert "a.pdf:4" not in top_texts(reopened, vectors[4], match_count=10)
+
+
+def test_quantized_codes_grow_geometrically(tmp_path, vectors):
+    store = QuantizedVectorStore(str(tmp_path), dim=DIM)
+    for i in range(100):
+        store.add(rows("a.pdf", vectors[i:i + 1], first_chunk_id=i))
+    assert len(store._codes) == 1024
+    store.add(rows("b.pdf", np.tile(vectors[:100], (10, 1))))
+    assert len(store._codes) == 2048
+
+
+def test_ivf_query_above_exact_search_limit(tmp_path):
+    # Clustered data, so probing a few lists still finds the exact match
+    rng = np.random.default_rng(1)
+    centers = rng.normal(size=(16, DIM))
+    vectors = (centers[rng.integers(0, 16, size=2000)] + rng.normal(scale=0.1, size=(2000, DIM))).astype(np.float32)
+    store = LocalVectorStore(str(tmp_path), dim=DIM, nlist=16, nprobe=4, exact_search_limit=500)
+    store.add(rows("a.pdf", vectors))
+    assert top_texts(store, vectors[1234], match_count=1) == ["a.pdf:1234"]
+    assert store._centroids is not None
+    store.delete("a.pdf", [1234])
+    assert "a.pdf:1234" not in top_texts(store, vectors[1234], match_count=5)